@@ -5,9 +5,9 @@ from typing import Optional
 
 from .tokens import Token, Span
 from .symbols import (
-    Phony_Type,
-    Phony_Scope,
-    Phony_Symbol,
+    PHONY_TYPE,
+    PHONY_SCOPE,
+    PHONY_SYMBOL,
     Symbol,
     SemanticType,
     Scope,
@@ -21,7 +21,7 @@ class AST:
 
 @dataclass(slots=True)
 class Expr(AST):
-    semantic_type: SemanticType = field(init=False, default_factory=Phony_Type)
+    semantic_type: SemanticType = field(init=False, default=PHONY_TYPE)
     register: str = field(init=False, default="PHONY_REGISTER")
 
 
@@ -29,18 +29,18 @@ class Expr(AST):
 class Id(AST):
     token: Token
 
-    symbol: Symbol = field(init=False, default_factory=Phony_Symbol)
-    semantic_type: SemanticType = field(init=False, default_factory=Phony_Type)
+    symbol: Symbol = field(init=False, default=PHONY_SYMBOL)
+    semantic_type: SemanticType = field(init=False, default=PHONY_TYPE)
 
 
 @dataclass(slots=True)
 class TypeAST(AST):
-    semantic_type: SemanticType = field(init=False, default_factory=Phony_Type)
+    semantic_type: SemanticType = field(init=False, default=PHONY_TYPE)
 
 
 @dataclass(slots=True)
 class Decl(AST):
-    semantic_type: SemanticType = field(init=False, default_factory=Phony_Type)
+    semantic_type: SemanticType = field(init=False, default=PHONY_TYPE)
 
 
 @dataclass(slots=True)
@@ -91,7 +91,7 @@ class CompoundStmt(Stmt):
     decls: list[VarDecl]
     stmts: list[Stmt]
 
-    local_scope: Scope = field(init=False, default_factory=Phony_Scope)
+    local_scope: Scope = field(init=False, default=PHONY_SCOPE)
 
 
 @dataclass(slots=True)
@@ -101,7 +101,7 @@ class FuncDecl(Decl):
     ret_type_ast: TypeAST
     body: CompoundStmt
 
-    func_scope: Scope = field(init=False, default_factory=Phony_Scope)
+    func_scope: Scope = field(init=False, default=PHONY_SCOPE)
     ar_size: int = field(init=False, default=9999999999)
     register_pool: list[str] = field(init=False, default_factory=list)
 
@@ -110,7 +110,7 @@ class FuncDecl(Decl):
 class Argument(AST):
     expr: Expr
 
-    semantic_type: SemanticType = field(init=False, default_factory=Phony_Type)
+    semantic_type: SemanticType = field(init=False, default=PHONY_TYPE)
 
 
 @dataclass(slots=True)
@@ -0,0 +1,140 @@
+import functools
+import hashlib
+import importlib
+import os
+import pickle
+import sys
+from typing import Any, Optional
+
+from .asts import Program
+from vm.vm_insns import Insn
+
+# Modules that compile() runs.  The fingerprint covers every loaded module
+# under the directories these (and vm) live in, so helpers they import are
+# included too.
+pass_modules: list[str] = [
+    "scanner",
+    "parse",
+    "bindings",
+    "typecheck",
+    "offsets",
+    "assign",
+    "codegen",
+    "tau.tokens",
+    "tau.asts",
+    "tau.symbols",
+    "tau.compile",
+    "vm.vm_insns",
+]
+
+
+def default_dir() -> str:
+    if "TAU_CACHE_DIR" in os.environ:
+        return os.environ["TAU_CACHE_DIR"]
+    return os.path.join(os.path.expanduser("~"), ".cache", "tau")
+
+
+def module_file(module: Any) -> Optional[str]:
+    fname: Optional[str] = getattr(module, "__file__", None)
+    return os.path.abspath(fname) if fname is not None else None
+
+
+@functools.cache
+def fingerprint() -> str:
+    roots: set[str] = set()
+    for name in pass_modules:
+        fname = module_file(importlib.import_module(name))
+        if fname is not None:
+            roots.add(os.path.dirname(fname) + os.sep)
+    h = hashlib.sha256()
+    for name, module in sorted(list(sys.modules.items())):
+        fname = module_file(module)
+        if fname is None or not any(fname.startswith(root) for root in roots):
+            continue
+        h.update(name.encode("utf-8"))
+        with open(fname, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def source_hash(input: str) -> str:
+    return hashlib.sha256(input.encode("utf-8")).hexdigest()
+
+
+class CompileCache:
+    directory: str
+    max_bytes: int
+    store_tree: bool
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        store_tree: bool = False,
+    ) -> None:
+        self.directory = directory if directory is not None else default_dir()
+        self.max_bytes = max_bytes
+        self.store_tree = store_tree
+
+    def path(self, input: str) -> str:
+        key = source_hash(input) + "-" + fingerprint()[:16]
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, input: str) -> Optional[tuple[Optional[Program], list[Insn]]]:
+        path = self.path(input)
+        try:
+            with open(path, "rb") as f:
+                entry: dict[str, Any] = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            self.discard(path)
+            return None
+        os.utime(path)  # mtime doubles as the LRU timestamp
+        return entry["tree"], entry["insns"]
+
+    def put(self, input: str, tree: Optional[Program], insns: list[Insn]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(input)
+        entry: dict[str, Any] = {
+            "tree": tree if self.store_tree else None,
+            "insns": insns,
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        total: int = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+
+    def discard(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                self.discard(os.path.join(self.directory, name))
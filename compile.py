@@ -1,6 +1,14 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
 # from tau import vm
 import scanner
 from .asts import Program
+from .cache import CompileCache
+from .instrument import Profiler, measure
+from .tokens import Token
 import parse
 import bindings
 import typecheck
@@ -10,15 +18,98 @@ import codegen
 from vm.vm_insns import Insn
 
 
+tree_passes: list[str] = ["parse", "bindings", "typecheck", "offsets", "assign", "codegen"]
+
+
 def compile(
     input: str,
+    profiler: Optional[Profiler] = None,
 ) -> tuple[scanner.Scanner, parse.Parser, Program, list[Insn]]:
-    lexer = scanner.Scanner(input)
-    psr = parse.Parser(lexer)
-    tree: Program = psr.parse()
-    bindings.process(tree)
-    typecheck.process(tree)
-    offsets.process(tree)
-    assign.process(tree)
-    insns = codegen.process(tree)
+    with measure(profiler, "scanner"):
+        lexer = scanner.Scanner(input)
+    with measure(profiler, "parse"):
+        psr = parse.Parser(lexer)
+        tree: Program = psr.parse()
+    insns = compile_parsed(tree, profiler)
+    if profiler is not None:
+        profiler.count(tree, tree_passes)
     return lexer, psr, tree, insns
+
+
+def compile_parsed(tree: Program, profiler: Optional[Profiler] = None) -> list[Insn]:
+    with measure(profiler, "bindings"):
+        bindings.process(tree)
+    with measure(profiler, "typecheck"):
+        typecheck.process(tree)
+    with measure(profiler, "offsets"):
+        offsets.process(tree)
+    with measure(profiler, "assign"):
+        assign.process(tree)
+    with measure(profiler, "codegen"):
+        insns: list[Insn] = codegen.process(tree)
+    return insns
+
+
+def compile_cached(
+    input: str, cache: CompileCache
+) -> tuple[Optional[Program], list[Insn]]:
+    # The tree is only available from a hit when the cache stores trees.
+    hit = cache.get(input)
+    if hit is not None:
+        return hit
+    _, _, tree, insns = compile(input)
+    cache.put(input, tree, insns)
+    return tree, insns
+
+
+class BatchResult(NamedTuple):
+    fname: str
+    tokens: Optional[list[Token]]
+    tree: Optional[Program]
+    insns: Optional[list[Insn]]
+    error: Optional[Exception]  # CompileError, ParseErrorException, OSError, ...
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    # directories expand to every .tau file beneath them; everything else is
+    # treated as a glob.  Duplicates are dropped, first occurrence wins.
+    fnames: list[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = glob.glob(os.path.join(pattern, "**", "*.tau"), recursive=True)
+        else:
+            found = glob.glob(pattern, recursive=True)
+            if not found and not glob.has_magic(pattern):
+                found = [pattern]  # let compile_file report the missing file
+        fnames.extend(sorted(found))
+    return list(dict.fromkeys(fnames))
+
+
+def compile_file(fname: str) -> BatchResult:
+    # Every failure, including an unreadable file or a crashing pass, comes
+    # back as the file's result so the rest of the batch is unaffected.
+    tokens: Optional[list[Token]] = None
+    tree: Optional[Program] = None
+    try:
+        with open(fname) as f:
+            input = f.read()
+        lexer = scanner.Scanner(input)
+        tokens = list(lexer)
+        psr = parse.Parser(lexer)
+        tree = psr.parse()
+        insns = compile_parsed(tree)
+    except Exception as e:
+        return BatchResult(fname, tokens, tree, None, e)
+    return BatchResult(fname, tokens, tree, insns, None)
+
+
+def compile_batch(patterns: list[str], jobs: Optional[int] = None) -> list[BatchResult]:
+    # Results come back in the order of expand_paths(), regardless of which
+    # worker finishes first.
+    fnames = expand_paths(patterns)
+    if jobs == 1 or len(fnames) <= 1:
+        return [compile_file(fname) for fname in fnames]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        workers = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(fnames) // (workers * 4))
+        return list(pool.map(compile_file, fnames, chunksize=chunksize))
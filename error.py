@@ -1,12 +1,12 @@
 from dataclasses import dataclass
 
-from .tokens import Span
+from .tokens import OffsetSpan, Span
 
 
 @dataclass(slots=True)
 class CompileError(Exception):
     msg: str
-    span: Span
+    span: Span | OffsetSpan
 
 
 @dataclass(slots=True)
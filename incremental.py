@@ -0,0 +1,119 @@
+# pyright: basic
+
+import dataclasses
+import hashlib
+from dataclasses import dataclass, field
+from typing import Optional
+
+import scanner
+import parse
+from .asts import Program
+from .compile import compile_parsed
+from .symbols import Phony_Scope, Scope
+from .tokens import Coord, Span, Token
+from .utilities import walker
+from vm.vm_insns import Insn
+
+# Whole-file change detection for --watch.  Each compile is diffed against
+# the previous one per FuncDecl, but the passes (bindings, typecheck,
+# offsets, assign, codegen) only process whole Programs, so a single dirty
+# function reruns all of them over the whole file.  The passes are skipped
+# only when no function's text changed; the previous decorated tree is then
+# moved to the new source positions and returned with the previous
+# instructions.
+
+
+def span_text(lines: list[str], span: Span) -> str:
+    # Coords are 1-based (line, col); end is exclusive.
+    return coord_text(lines, span.start, span.end)
+
+
+def coord_text(lines: list[str], start: Coord, end: Coord) -> str:
+    if start.line == end.line:
+        return lines[start.line - 1][start.col - 1 : end.col - 1]
+    parts = [lines[start.line - 1][start.col - 1 :]]
+    parts.extend(lines[start.line : end.line - 1])
+    parts.append(lines[end.line - 1][: end.col - 1])
+    return "\n".join(parts)
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class FuncInfo:
+    name: str
+    text: str  # digest of the whole declaration
+
+
+def summarize(input: str, tree: Program) -> list[FuncInfo]:
+    lines = input.split("\n")
+    infos: list[FuncInfo] = []
+    for decl in tree.decls:
+        infos.append(FuncInfo(decl.id.token.value, digest(span_text(lines, decl.span))))
+    return infos
+
+
+def respan(old: Program, new: Program) -> None:
+    # Gives old's nodes, tokens and scopes the positions of new's; the two
+    # trees must have the same shape.
+    moved: dict[Span, Span] = {}
+    scopes: list[Scope] = []
+    for a, b in zip(walker.nodes(old), walker.nodes(new), strict=True):
+        assert type(a) is type(b), f"{a} and {b} differ in shape"
+        moved[a.span] = b.span
+        a.span = b.span
+        for f in dataclasses.fields(a):
+            value = getattr(a, f.name)
+            if isinstance(value, Token):
+                setattr(a, f.name, getattr(b, f.name))
+            elif isinstance(value, Scope) and not isinstance(value, Phony_Scope):
+                scopes.append(value)
+    seen: set[int] = set()
+    for scope in scopes:
+        ancestor: Optional[Scope] = scope
+        while ancestor is not None and id(ancestor) not in seen:
+            seen.add(id(ancestor))
+            ancestor.span = moved.get(ancestor.span, ancestor.span)
+            ancestor = ancestor.parent
+
+
+@dataclass(slots=True)
+class ChangeResult:
+    tree: Program
+    insns: list[Insn]
+    changed: set[str]  # functions whose text differs from the last compile
+    reused: bool  # True when the passes were skipped entirely
+
+
+@dataclass
+class ChangeTrackingCompiler:
+    tree: Optional[Program] = None
+    insns: Optional[list[Insn]] = None
+    funcs: list[FuncInfo] = field(default_factory=list)
+
+    def compile(self, input: str) -> ChangeResult:
+        lexer = scanner.Scanner(input)
+        psr = parse.Parser(lexer)
+        tree: Program = psr.parse()
+        funcs = summarize(input, tree)
+        changed = self.diff(funcs)
+        same_shape = [f.name for f in funcs] == [f.name for f in self.funcs]
+        if self.tree is not None and self.insns is not None and same_shape and not changed:
+            # Only whitespace or comments between functions moved; the
+            # previous instructions are still valid, the positions are not.
+            respan(self.tree, tree)
+            self.funcs = funcs
+            return ChangeResult(self.tree, self.insns, changed, True)
+        insns = compile_parsed(tree)
+        self.tree, self.insns, self.funcs = tree, insns, funcs
+        return ChangeResult(tree, insns, changed, False)
+
+    def diff(self, funcs: list[FuncInfo]) -> set[str]:
+        old: dict[str, FuncInfo] = {f.name: f for f in self.funcs}
+        new: dict[str, FuncInfo] = {f.name: f for f in funcs}
+        changed: set[str] = {
+            name for name in new if name not in old or old[name].text != new[name].text
+        }
+        return changed | (old.keys() - new.keys())
@@ -0,0 +1,105 @@
+import contextlib
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict, field
+from typing import Iterator, Optional, TextIO
+
+from .asts import AST
+from .utilities import table_visitor
+
+
+@dataclass(slots=True)
+class PassStats:
+    name: str
+    wall: float = 0.0  # seconds
+    cpu: float = 0.0  # seconds
+    peak_memory: int = 0  # bytes above the pass's starting point; 0 if untraced
+    nodes: int = 0  # AST nodes in the tree the pass worked on
+
+
+def count_nodes(tree: AST) -> int:
+    count: int = 0
+
+    def bump(_: AST) -> None:
+        nonlocal count
+        count += 1
+
+    table_visitor.TableVisitor(bump).walk(tree)
+    return count
+
+
+@dataclass
+class Profiler:
+    trace_memory: bool = True
+    passes: list[PassStats] = field(default_factory=list)
+
+    @contextlib.contextmanager
+    def measure(self, name: str) -> Iterator[PassStats]:
+        stats = PassStats(name)
+        started_tracing: bool = False
+        base: int = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.wall = time.perf_counter() - wall
+            stats.cpu = time.process_time() - cpu
+            if self.trace_memory:
+                stats.peak_memory = tracemalloc.get_traced_memory()[1] - base
+                if started_tracing:
+                    tracemalloc.stop()
+            self.passes.append(stats)
+
+    def count(self, tree: AST, passes: list[str]) -> None:
+        # Passes decorate the tree but never add nodes, so one walk suffices.
+        nodes = count_nodes(tree)
+        for stats in self.passes:
+            if stats.name in passes:
+                stats.nodes = nodes
+
+    def total(self) -> PassStats:
+        total = PassStats("total")
+        for stats in self.passes:
+            total.wall += stats.wall
+            total.cpu += stats.cpu
+            total.peak_memory = max(total.peak_memory, stats.peak_memory)
+            total.nodes = max(total.nodes, stats.nodes)
+        return total
+
+    def print_table(self, file: TextIO) -> None:
+        header = f"{'pass':12} {'wall ms':>10} {'cpu ms':>10} {'peak KiB':>10} {'nodes':>8}"
+        print(header, file=file)
+        print("-" * len(header), file=file)
+        for stats in self.passes + [self.total()]:
+            print(
+                f"{stats.name:12} {stats.wall * 1000:10.3f} {stats.cpu * 1000:10.3f} "
+                f"{stats.peak_memory / 1024:10.1f} {stats.nodes:8}",
+                file=file,
+            )
+
+    def dump_json(self, file: TextIO) -> None:
+        json.dump(
+            {
+                "passes": [asdict(stats) for stats in self.passes],
+                "total": asdict(self.total()),
+            },
+            file,
+            indent=2,
+        )
+        print(file=file)
+
+
+def measure(
+    profiler: Optional[Profiler], name: str
+) -> contextlib.AbstractContextManager[Optional[PassStats]]:
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.measure(name)
@@ -1,30 +1,55 @@
 from argparse import Namespace, ArgumentParser
-from typing import List
+from typing import List, Optional
 import sys
+import time
+import traceback
 
 # from tau import vm
 from vm import vm_utils
 from vm.vm_insns import Insn
-from .compile import compile
+from .cache import CompileCache
+from .compile import compile, compile_batch, compile_cached
 from .error import *
+from .incremental import ChangeTrackingCompiler
+from .instrument import Profiler
+from .watch import watch
 import parse
 
 
 def main() -> None:
     args: Namespace = get_args()
+    if args.batch:
+        batch(args)
+        return
+    if args.watch:
+        try:
+            watch(args.watch, lambda fnames: rebuild(fnames, args), args.interval)
+        except KeyboardInterrupt:
+            pass
+        return
     fname: str = args.file
     input: str
     with open(fname) as f:
         input = f.read()
     verbose: bool = args.verbose
     insns: List[Insn]
+    profiler: Optional[Profiler] = None
 
     try:
-        _, _, _, insns = compile(input)
+        if args.profile or args.profile_json:
+            profiler = Profiler()
+            _, _, _, insns = compile(input, profiler)
+        elif args.no_cache:
+            _, _, _, insns = compile(input)
+        else:
+            _, insns = compile_cached(input, CompileCache(args.cache_dir))
         if args.asm:
             vm_utils.dump_insns(insns)
         else:
             vm_utils.invoke_vm(insns, args.args, verbose)
+        # After the run, so "--profile-json -" is not mixed into its output.
+        if profiler is not None:
+            report(profiler, args)
     except parse.ParseErrorException as e:
         print(e, file=sys.stderr)
         if verbose:
@@ -37,9 +62,114 @@ def main() -> None:
         sys.exit(1)
 
 
+def report(profiler: Profiler, args: Namespace) -> None:
+    if args.profile:
+        profiler.print_table(sys.stderr)
+    if args.profile_json == "-":
+        profiler.dump_json(sys.stdout)
+    elif args.profile_json:
+        with open(args.profile_json, "w") as f:
+            profiler.dump_json(f)
+
+
+compilers: dict[str, ChangeTrackingCompiler] = {}
+
+
+def rebuild(fnames: list[str], args: Namespace) -> None:
+    # Nothing raised for one file may end the watch loop.
+    for fname in fnames:
+        try:
+            with open(fname) as f:
+                input = f.read()
+        except OSError as e:
+            print(f"{fname}: {e}", file=sys.stderr)
+            continue
+        compiler = compilers.setdefault(fname, ChangeTrackingCompiler())
+        start = time.perf_counter()
+        try:
+            result = compiler.compile(input)
+        except (parse.ParseErrorException, CompileError) as e:
+            print(f"{fname}: {e}", file=sys.stderr)
+            continue
+        except Exception:
+            print(f"{fname}: a compiler pass failed", file=sys.stderr)
+            traceback.print_exc()
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        how = "reused" if result.reused else "recompiled"
+        print(f"{fname}: compiled in {elapsed:.1f} ms ({how})", file=sys.stderr)
+        try:
+            if args.asm:
+                vm_utils.dump_insns(result.insns)
+            else:
+                vm_utils.invoke_vm(result.insns, args.args, args.verbose)
+        except Exception:
+            print(f"{fname}: the program failed", file=sys.stderr)
+            traceback.print_exc()
+
+
+def describe(e: Exception) -> str:
+    if isinstance(e, (CompileError, parse.ParseErrorException)):
+        return str(e)
+    return f"{e.__class__.__name__}: {e}"
+
+
+def batch(args: Namespace) -> None:
+    failed: int = 0
+    results = compile_batch(args.batch, args.jobs)
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            print(f"{result.fname}: {describe(result.error)}", file=sys.stderr)
+            continue
+        assert result.insns is not None
+        if args.asm:
+            print(f"{result.fname}:")
+            vm_utils.dump_insns(result.insns)
+        elif args.verbose:
+            print(f"{result.fname}: {len(result.insns)} insns")
+    print(f"{len(results) - failed}/{len(results)} compiled", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
 def get_args() -> Namespace:
     ap: ArgumentParser = ArgumentParser(description="Compile Tau files")
-    ap.add_argument("--file", required=True, help="source file")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="source file")
+    source.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="PATH",
+        help="compile many files, globs, or directories of .tau files (no execution)",
+    )
+    source.add_argument(
+        "--watch",
+        nargs="+",
+        metavar="PATH",
+        help="recompile and rerun .tau files (or directories) when they change",
+    )
+    ap.add_argument(
+        "--jobs", type=int, default=None, help="worker processes for --batch"
+    )
+    ap.add_argument(
+        "--interval", type=float, default=0.25, help="--watch polling interval (s)"
+    )
+    ap.add_argument(
+        "--no-cache", action="store_true", help="always run the full pipeline"
+    )
+    ap.add_argument(
+        "--cache-dir", default=None, help="compilation cache directory"
+    )
+    ap.add_argument(
+        "--profile", action="store_true", help="print per-pass time and memory"
+    )
+    ap.add_argument(
+        "--profile-json",
+        default=None,
+        metavar="FILE",
+        help="write per-pass profile as JSON ('-' for stdout, after the program's output)",
+    )
     ap.add_argument("--verbose", action="store_true", help="verbose interpretation")
     ap.add_argument("--asm", action="store_true", help="(only) generate asm")
     ap.add_argument(
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 from .tokens import Span
 
 
@@ -12,14 +12,39 @@ class SemanticType:
         return f"{self.__class__.__name__}()"
 
 
+# Canonical instances: VoidType(), IntType() and BoolType() always return the
+# same object, and ArrayType(t, n) returns one object per (t, n), so types
+# built from canonical parts can be compared with `is`.  The Phony_*
+# placeholders are shared the same way.
+_singletons: dict[type, Any] = {}
+_arrays: dict[tuple[SemanticType, int], "ArrayType"] = {}
+
+
+def _singleton(cls: type) -> Any:
+    if cls not in _singletons:
+        _singletons[cls] = object.__new__(cls)
+    return _singletons[cls]
+
+
 class Phony_Type(SemanticType):
+    __slots__: list[str] = []
+
+    def __new__(cls) -> "Phony_Type":
+        return _singleton(cls)
+
     def __repr__(self) -> str:
         return "Phony_Type()"
 
 
+PHONY_TYPE: Phony_Type = Phony_Type()
+
+
 class VoidType(SemanticType):
     __slots__: list[str] = []
 
+    def __new__(cls) -> "VoidType":
+        return _singleton(cls)
+
     def size(self) -> int:
         return 0
 
@@ -30,6 +55,9 @@ class VoidType(SemanticType):
 class IntType(SemanticType):
     __slots__: list[str] = []
 
+    def __new__(cls) -> "IntType":
+        return _singleton(cls)
+
     def size(self) -> int:
         return 1
 
@@ -40,6 +68,9 @@ class IntType(SemanticType):
 class BoolType(SemanticType):
     __slots__: list[str] = []
 
+    def __new__(cls) -> "BoolType":
+        return _singleton(cls)
+
     def size(self) -> int:
         return 1
 
@@ -52,9 +83,44 @@ class ArrayType(SemanticType):
     count: int
     __slots__: list[str] = ["element_type", "count"]
 
-    def __init__(self, element_type: SemanticType, count: int):
-        self.element_type = element_type
-        self.count = count
+    def __new__(
+        cls, element_type: Optional[SemanticType] = None, count: int = 0
+    ) -> "ArrayType":
+        if element_type is None:
+            return object.__new__(cls)  # unpickling; __setstate__ fills it in
+        key: tuple[SemanticType, int] = (element_type, count)
+        if cls is ArrayType and key in _arrays:
+            return _arrays[key]
+        t = object.__new__(cls)
+        object.__setattr__(t, "element_type", element_type)
+        object.__setattr__(t, "count", count)
+        if cls is ArrayType:
+            _arrays[key] = t
+        return t
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Shared instances: changing one would change every array type
+        # built from the same parts.
+        if name in ("element_type", "count"):
+            raise AttributeError(f"ArrayType.{name} cannot be changed")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if name in ("element_type", "count"):
+            raise AttributeError(f"ArrayType.{name} cannot be changed")
+        object.__delattr__(self, name)
+
+    def __setstate__(self, state: Any) -> None:
+        # Only pickles written before __reduce__ existed get here.  Their
+        # instances cannot be swapped for the canonical ones, which is why
+        # same_type() compares array types by their parts.
+        slots: dict[str, Any] = state[1] if isinstance(state, tuple) else state
+        for name, value in slots.items():
+            object.__setattr__(self, name, value)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Rebuild through the intern table so copies come back canonical.
+        return (self.__class__, (self.element_type, self.count))
 
     def size(self) -> int:
         return self.element_type.size() * self.count
@@ -83,6 +149,24 @@ class FuncType(SemanticType):
         return f"Functype(params={self.params}, ret={self.ret})"
 
 
+def same_type(a: SemanticType, b: SemanticType) -> bool:
+    # Canonical types compare by identity.  FuncTypes are not shared because
+    # offsets stores per-function sizes in them, so they compare by
+    # signature.  ArrayTypes from old pickles are not canonical, so array
+    # types that are not identical still compare by their parts.
+    if a is b:
+        return True
+    if isinstance(a, ArrayType) and isinstance(b, ArrayType):
+        return a.count == b.count and same_type(a.element_type, b.element_type)
+    if isinstance(a, FuncType) and isinstance(b, FuncType):
+        return (
+            same_type(a.ret, b.ret)
+            and len(a.params) == len(b.params)
+            and all(same_type(p, q) for p, q in zip(a.params, b.params))
+        )
+    return False
+
+
 class Symbol:
     name: str
     scope: "Scope"
@@ -94,7 +178,7 @@ class Symbol:
     def __init__(self, name: str, scope: "Scope") -> None:
         self.name: str = name
         self.scope: Scope = scope
-        self._semantic_type: SemanticType = Phony_Type()
+        self._semantic_type: SemanticType = PHONY_TYPE
         self.offset = -999999
 
     def set_type(self, t: SemanticType) -> None:
@@ -111,30 +195,109 @@ class Symbol:
 
 
 class Phony_Symbol(Symbol):
+    __slots__: list[str] = []
+
+    def __new__(cls) -> "Phony_Symbol":
+        return _singleton(cls)
+
     def __init__(self) -> None:
         pass
 
+    def __setstate__(self, state: Any) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Shared by every node that has no real symbol yet.
+        raise AttributeError(f"Phony_Symbol cannot be changed")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"Phony_Symbol cannot be changed")
+
     def __repr__(self) -> str:
         return "Phony_Symbol()"
 
 
+PHONY_SYMBOL: Phony_Symbol = Phony_Symbol()
+
+
 class Scope:
     symtab: dict[str, Symbol]
     parent: Optional["Scope"]
     span: Span
-    __slots__: list[str] = ["symtab", "parent", "span"]
+    _depth: int
+    _resolved: dict[str, Symbol]  # names found in ancestors, as of _generation
+    _generation: int
+    __slots__: list[str] = [
+        "symtab",
+        "parent",
+        "span",
+        "_depth",
+        "_resolved",
+        "_generation",
+    ]
+
+    # Bumped by define()/invalidate(); a scope's _resolved cache is only
+    # trusted while its _generation matches.  Symbols written straight into
+    # an ancestor's symtab after lookups have started should be followed by
+    # Scope.invalidate() if they can shadow an outer name.
+    generation: int = 0
+
+    def __init__(self, parent: Optional["Scope"], span: Span) -> None:
+        self.symtab = {}
+        self.parent = parent
+        self.span = span
+        self._depth = parent.depth() + 1 if parent else 0
+        self._resolved = {}
+        self._generation = Scope.generation
+
+    def __setstate__(self, state: Any) -> None:
+        # Pickles (including ones written before the caches existed) only
+        # need the real slots; the caches are rebuilt on demand.
+        slots: dict[str, Any] = state[1] if isinstance(state, tuple) else state
+        for name in ["symtab", "parent", "span"]:
+            if name in slots:
+                setattr(self, name, slots[name])
+        self._depth = -1
+        self._resolved = {}
+        self._generation = -1
+
+    def define(self, name: str, symbol: Symbol) -> None:
+        self.symtab[name] = symbol
+        Scope.invalidate()
+
+    @staticmethod
+    def invalidate() -> None:
+        Scope.generation += 1
 
     def lookup(self, name: str) -> Symbol | None:
         if name in self.symtab:
             return self.symtab[name]
-        if self.parent:
-            return self.parent.lookup(name)
+        if self._generation != Scope.generation:
+            self._resolved.clear()
+            self._generation = Scope.generation
+        elif name in self._resolved:
+            return self._resolved[name]
+        scope = self.parent
+        while scope is not None:
+            if name in scope.symtab:
+                symbol = scope.symtab[name]
+                self._resolved[name] = symbol
+                return symbol
+            scope = scope.parent
         return None
 
     def depth(self) -> int:
-        if self.parent:
-            return self.parent.depth() + 1
-        return 0
+        if self._depth < 0:
+            unknown: list[Scope] = []
+            scope: Optional[Scope] = self
+            while scope is not None and scope._depth < 0:
+                unknown.append(scope)
+                scope = scope.parent
+            depth = scope._depth if scope is not None else -1
+            for scope in reversed(unknown):
+                depth += 1
+                scope._depth = depth
+        return self._depth
 
     def shallow_representation(self) -> str:
         parent = self.parent.shallow_representation() if self.parent else ""
@@ -146,21 +309,37 @@ class Scope:
 
 
 class Phony_Scope(Scope):
+    __slots__: list[str] = []
+
+    def __new__(cls) -> "Phony_Scope":
+        return _singleton(cls)
+
     def __init__(self) -> None:
         pass
 
+    def __setstate__(self, state: Any) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Shared by every node that has no real scope yet.
+        raise AttributeError(f"Phony_Scope cannot be changed")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"Phony_Scope cannot be changed")
+
     def __repr__(self) -> str:
         return "Phony_Scope()"
 
 
+PHONY_SCOPE: Phony_Scope = Phony_Scope()
+
+
 # holds parameters
 class FuncScope(Scope):
     __slots__: list[str] = []
 
     def __init__(self, parent: Scope, span: Span) -> None:
-        self.symtab = {}
-        self.parent = parent
-        self.span = span
+        super().__init__(parent, span)
 
 
 # holds symbols in compound statement
@@ -168,9 +347,7 @@ class LocalScope(Scope):
     __slots__: list[str] = []
 
     def __init__(self, parent: Scope, span: Span) -> None:
-        self.parent = parent
-        self.span: Span = span
-        self.symtab: dict[str, Symbol] = {}
+        super().__init__(parent, span)
 
 
 # holds global symbols (i.e., function declarations)
@@ -178,6 +355,4 @@ class GlobalScope(Scope):
     __slots__: list[str] = []
 
     def __init__(self, span: Span) -> None:
-        self.span: Span = span
-        self.symtab: dict[str, Symbol] = {}
-        self.parent = None
+        super().__init__(None, span)
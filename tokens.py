@@ -1,4 +1,7 @@
+import array
+import bisect
 import typing
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Sequence, overload
 
 
 class Coord(typing.NamedTuple):
@@ -63,3 +66,180 @@ keywords: list[str] = [
 ]
 
 kinds: list[str] = ["ID", "INT", "EOF"] + punctuation + keywords
+
+kind_codes: dict[str, int] = {kind: code for code, kind in enumerate(kinds)}
+
+
+class LineIndex:
+    # Offsets of the first character of each line; Coords are 1-based.
+    starts: list[int]
+
+    def __init__(self, source: str) -> None:
+        self.starts = [0]
+        i = source.find("\n")
+        while i >= 0:
+            self.starts.append(i + 1)
+            i = source.find("\n", i + 1)
+
+    def coord(self, offset: int) -> Coord:
+        line = bisect.bisect_right(self.starts, offset)
+        return Coord(line, offset - self.starts[line - 1] + 1)
+
+    def offset(self, coord: Coord) -> int:
+        return self.starts[coord.line - 1] + coord.col - 1
+
+
+# Type checkers see OffsetSpan as a Span, so it fits Token.span and
+# AST.span; at run time it is not a tuple at all.
+if TYPE_CHECKING:
+    _SpanBase = Span
+else:
+    _SpanBase = object
+
+
+class OffsetSpan(_SpanBase):
+    # A Span held as source offsets plus the source's shared LineIndex.  The
+    # start and end Coords are computed when asked for (error messages,
+    # printing, comparison), so building one costs no tuples.  It compares,
+    # hashes, unpacks and pickles like the equivalent Span.
+    __slots__ = ["lines", "start_offset", "end_offset"]
+    lines: LineIndex
+    start_offset: int
+    end_offset: int
+
+    def __init__(self, lines: LineIndex, start_offset: int, end_offset: int) -> None:
+        self.lines = lines
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+
+    @property
+    def start(self) -> Coord:
+        return self.lines.coord(self.start_offset)
+
+    @property
+    def end(self) -> Coord:
+        return self.lines.coord(self.end_offset)
+
+    def span(self) -> Span:
+        return Span(self.start, self.end)
+
+    def __iter__(self) -> Iterator[Coord]:
+        yield self.start
+        yield self.end
+
+    def __len__(self) -> int:
+        return 2
+
+    @overload
+    def __getitem__(self, i: typing.SupportsIndex) -> Coord: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> tuple[Coord, ...]: ...
+
+    def __getitem__(self, i: typing.SupportsIndex | slice) -> Coord | tuple[Coord, ...]:
+        return self.span()[i]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, OffsetSpan) and other.lines is self.lines:
+            return (self.start_offset, self.end_offset) == (
+                other.start_offset,
+                other.end_offset,
+            )
+        if isinstance(other, (Span, OffsetSpan)):
+            return self.span() == tuple(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.span())
+
+    def __repr__(self) -> str:
+        return repr(self.span())
+
+    def __reduce__(self) -> Any:
+        return (Span, tuple(self.span()))
+
+
+def join(first: Span | OffsetSpan, last: Span | OffsetSpan) -> Span | OffsetSpan:
+    # The span from the start of first to the end of last: two integers
+    # when both are offset spans over the same source.
+    if (
+        isinstance(first, OffsetSpan)
+        and isinstance(last, OffsetSpan)
+        and first.lines is last.lines
+    ):
+        return OffsetSpan(first.lines, first.start_offset, last.end_offset)
+    return Span(first.start, last.end)
+
+
+class TokenStore(Sequence[Token]):
+    # Array-backed token stream: one byte of kind plus two offsets per token.
+    # Token/Span/Coord objects are only built when a token is accessed, and
+    # a token's value is always the source text it covers.  With offsets set,
+    # tokens carry OffsetSpans and no Coords are built at all.
+    source: str
+    lines: LineIndex
+    offsets: bool
+    _kinds: array.array
+    _starts: array.array
+    _ends: array.array
+
+    def __init__(self, source: str, offsets: bool = False) -> None:
+        self.source = source
+        self.lines = LineIndex(source)
+        self.offsets = offsets
+        self._kinds = array.array("B")
+        self._starts = array.array("q")
+        self._ends = array.array("q")
+
+    @classmethod
+    def from_tokens(
+        cls, source: str, tokens: Iterable[Token], offsets: bool = False
+    ) -> "TokenStore":
+        store = cls(source, offsets)
+        for token in tokens:
+            start = store.lines.offset(token.span.start)
+            end = store.lines.offset(token.span.end)
+            assert source[start:end] == token.value, f"{token} does not match source"
+            store.append(token.kind, start, end)
+        return store
+
+    def append(self, kind: str, start: int, end: int) -> None:
+        self._kinds.append(kind_codes[kind])
+        self._starts.append(start)
+        self._ends.append(end)
+
+    def kind(self, i: int) -> str:
+        return kinds[self._kinds[i]]
+
+    def value(self, i: int) -> str:
+        return self.source[self._starts[i] : self._ends[i]]
+
+    def span(self, i: int) -> Span | OffsetSpan:
+        if self.offsets:
+            return OffsetSpan(self.lines, self._starts[i], self._ends[i])
+        return Span(self.lines.coord(self._starts[i]), self.lines.coord(self._ends[i]))
+
+    def token(self, i: int) -> Token:
+        return Token(self.kind(i), self.value(i), self.span(i))
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    @overload
+    def __getitem__(self, i: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Token]: ...
+
+    def __getitem__(self, i: int | slice) -> Token | list[Token]:
+        if isinstance(i, slice):
+            return [self.token(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("token index out of range")
+        return self.token(i)
+
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self)):
+            yield self.token(i)
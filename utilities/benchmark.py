@@ -0,0 +1,168 @@
+from argparse import Namespace, ArgumentParser
+from types import ModuleType
+from typing import Any, Callable, Optional
+import contextlib
+import io
+import json
+import sys
+import time
+
+from tau import testers
+from tau.compile import expand_paths
+from tau.instrument import count_nodes
+
+
+def run_codegen(input: str) -> Any:
+    # testers.run_codegen also runs the program in the VM; time the pass alone.
+    import codegen
+
+    return codegen.process(testers.run_assign(input))
+
+
+# (stage, runner, unit) -- each runner recompiles its whole prefix, as the
+# graders call it.  A stage's own time is its runner's time less the
+# previous runner's.
+stages: list[tuple[str, Callable[[str], Any], str]] = [
+    ("scanner", testers.run_scanner, "tokens"),
+    ("ast", testers.run_ast, "nodes"),
+    ("binding", testers.run_binding, "nodes"),
+    ("typecheck", testers.run_typecheck, "nodes"),
+    ("offsets", testers.run_offsets, "nodes"),
+    ("assign", testers.run_assign, "nodes"),
+    ("codegen", run_codegen, "insns"),
+]
+
+
+def load_codegen() -> Optional[ModuleType]:
+    try:
+        import codegen
+    except ImportError as e:
+        print(f"cannot import codegen, skipping its stage: {e}", file=sys.stderr)
+        return None
+    return codegen
+
+
+def measure_units(input: str, codegen: Optional[ModuleType]) -> dict[str, int]:
+    # Compile errors just mean the file stops counting at that stage.
+    units: dict[str, int] = {}
+    with contextlib.suppress(Exception):
+        units["tokens"] = len(testers.run_scanner(input))
+        units["nodes"] = count_nodes(testers.run_ast(input))
+        if codegen is not None:
+            units["insns"] = len(codegen.process(testers.run_assign(input)))
+    return units
+
+
+def time_file(input: str, counts: dict[str, int], repeat: int) -> list[float]:
+    # Best time of each runner on input, up to the first that fails.
+    best: list[float] = []
+    for _, runner, unit in stages:
+        if unit not in counts:
+            break  # the file fails before this stage produces output
+        fastest: Optional[float] = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    runner(input)
+            except Exception:
+                break
+            elapsed = time.perf_counter() - start
+            fastest = elapsed if fastest is None else min(fastest, elapsed)
+        if fastest is None:
+            break
+        best.append(fastest)
+    return best
+
+
+def run(fnames: list[str], repeat: int) -> dict[str, dict[str, Any]]:
+    codegen = load_codegen()
+    seconds: list[float] = [0.0] * len(stages)
+    files: list[int] = [0] * len(stages)
+    units: list[int] = [0] * len(stages)
+    for fname in fnames:
+        with open(fname) as f:
+            input = f.read()
+        counts = measure_units(input, codegen)
+        times = time_file(input, counts, repeat)
+        for i, elapsed in enumerate(times):
+            previous = times[i - 1] if i > 0 else 0.0
+            seconds[i] += max(0.0, elapsed - previous)
+            files[i] += 1
+            units[i] += counts[stages[i][2]]
+    return {
+        stage: {
+            "files": files[i],
+            "unit": unit,
+            "units": units[i],
+            "seconds": seconds[i],
+            "rate": units[i] / seconds[i] if seconds[i] > 0 else 0.0,
+        }
+        for i, (stage, _, unit) in enumerate(stages)
+    }
+
+
+def report(results: dict[str, dict[str, Any]]) -> None:
+    print(f"{'stage':10} {'files':>6} {'seconds':>9} {'rate':>20}")
+    for stage, r in results.items():
+        rate = f"{r['rate']:,.0f} {r['unit']}/s"
+        print(f"{stage:10} {r['files']:6} {r['seconds']:9.3f} {rate:>20}")
+
+
+def compare(
+    results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], threshold: float
+) -> list[str]:
+    regressions: list[str] = []
+    for stage, r in results.items():
+        if stage not in baseline or baseline[stage]["rate"] <= 0:
+            continue
+        ratio = r["rate"] / baseline[stage]["rate"]
+        if ratio < 1.0 - threshold:
+            regressions.append(
+                f"{stage}: {r['rate']:,.0f} {r['unit']}/s is {1 - ratio:.1%} "
+                f"below baseline {baseline[stage]['rate']:,.0f}"
+            )
+    return regressions
+
+
+def main() -> None:
+    args: Namespace = get_args()
+    results = run(expand_paths(args.files), args.repeat)
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline: dict[str, dict[str, Any]] = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def get_args() -> Namespace:
+    ap: ArgumentParser = ArgumentParser(description="Benchmark Tau passes over a corpus")
+    ap.add_argument(
+        "files",
+        nargs="*",
+        default=["tau/tests"],
+        help="source files, globs, or directories (default: tau/tests)",
+    )
+    ap.add_argument("--repeat", type=int, default=3, help="take the best of N runs")
+    ap.add_argument("--save", type=str, default="", help="write results as JSON")
+    ap.add_argument(
+        "--baseline", type=str, default="", help="baseline JSON to compare against"
+    )
+    ap.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed fractional slowdown before failing",
+    )
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from argparse import Namespace, ArgumentParser
+from typing import Any, Iterable, Optional, Sequence, overload
+import mmap
+import os
+import pickle
+import struct
+
+# A test bundle holds the same cases as a milestone pickle, but each case is
+# pickled on its own:
+#
+#   header   MAGIC, index offset, index length
+#   records  one pickled case dict after another
+#   index    pickled list of (file, offset, length), one per case
+#
+# Bundle maps the file and only unpickles a case when it is asked for, so
+# opening a bundle costs the index alone and a process touching a few cases
+# never pays for the rest.  Forked grading workers share the mapping.
+#
+# Cases stay ordinary pickles.  A purpose-built encoding for decorated
+# trees was measured over every milestone output: it was only 5% smaller
+# than pickle protocol 5, slower to write, and not reliably faster to read.
+
+MAGIC: bytes = b"TAUBNDL1"
+header: struct.Struct = struct.Struct("<8sQQ")
+
+Case = dict[str, Any]
+
+
+def is_bundle(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write(cases: Iterable[Case], path: str) -> int:
+    entries: list[tuple[str, int, int]] = []
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.pack(MAGIC, 0, 0))
+        for case in cases:
+            data = pickle.dumps(case, protocol=pickle.HIGHEST_PROTOCOL)
+            entries.append((case["file"], f.tell(), len(data)))
+            f.write(data)
+        index = pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+        offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(header.pack(MAGIC, offset, len(index)))
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class Bundle(Sequence[Case]):
+    path: str
+    files: list[str]
+    entries: list[tuple[str, int, int]]
+    positions: Optional[dict[str, int]]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, offset, length = header.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a test bundle")
+        self.entries = pickle.loads(self.map[offset : offset + length])
+        self.files = [file for file, _, _ in self.entries]
+        self.positions = None
+
+    def __reduce__(self) -> Any:
+        return (Bundle, (self.path,))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @overload
+    def __getitem__(self, i: int) -> Case: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Case]: ...
+
+    def __getitem__(self, i: int | slice) -> Case | list[Case]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        _, offset, length = self.entries[i]
+        return pickle.loads(self.map[offset : offset + length])
+
+    def find(self, file: str) -> Optional[int]:
+        if self.positions is None:
+            self.positions = {f: i for i, f in enumerate(self.files)}
+        return self.positions.get(file)
+
+    def select(self, files: Iterable[str]) -> list[Case]:
+        positions = [self.find(file) for file in files]
+        return [self[i] for i in positions if i is not None]
+
+
+def files(cases: Sequence[Case]) -> list[str]:
+    # Test names without unpickling a bundle's cases.
+    if isinstance(cases, Bundle):
+        return cases.files
+    return [case["file"] for case in cases]
+
+
+def load(path: str) -> Sequence[Case]:
+    if is_bundle(path):
+        return Bundle(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def pack(inputs: list[str], output: str) -> None:
+    for fname in inputs:
+        outname = output or os.path.splitext(fname)[0] + ".bundle"
+        with open(fname, "rb") as f:
+            cases: list[Case] = pickle.load(f)
+        count = write(cases, outname)
+        print(f"Wrote {outname} ({count} tests)")
+
+
+def unpack(inputs: list[str], output: str) -> None:
+    for fname in inputs:
+        outname = output or os.path.splitext(fname)[0] + ".pickle"
+        cases = list(Bundle(fname))
+        with open(outname, "wb") as f:
+            pickle.dump(cases, f)
+        print(f"Wrote {outname} ({len(cases)} tests)")
+
+
+def main() -> None:
+    args: Namespace = get_args()
+    match args.command:
+        case "pack":
+            pack(args.files, args.output)
+        case "unpack":
+            unpack(args.files, args.output)
+        case _:
+            assert False, f"unknown command {args.command}"
+
+
+def get_args() -> Namespace:
+    ap: ArgumentParser = ArgumentParser(description="Convert milestone test bundles")
+    command = ap.add_subparsers(dest="command", required=True)
+    subs: dict[str, ArgumentParser] = {}
+    for name, help in (
+        ("pack", "convert pickles to bundles"),
+        ("unpack", "convert bundles to pickles"),
+    ):
+        sub = command.add_parser(name, help=help)
+        sub.add_argument("files", nargs="+", help="input files")
+        sub.add_argument(
+            "--output", type=str, default="", help="output file (single input)"
+        )
+        subs[name] = sub
+    args = ap.parse_args()
+    if args.output and len(args.files) != 1:
+        subs[args.command].error("--output takes exactly one input file")
+    return args
+
+
+if __name__ == "__main__":
+    main()
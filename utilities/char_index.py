@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional, TypeAlias
+import hashlib
+import os
+import pickle
+import tomllib
+
+# Inverted index over characterized TOMLs (see mkcharacter.characterize), so
+# that `match` patterns are answered with set operations instead of parsing
+# every TOML and scanning its node list per pattern node.  The index is a
+# single pickle; an entry is refreshed when its TOML's mtime or size changes,
+# and --verify rehashes a source only when the source's mtime changed.
+
+Container: TypeAlias = dict[str, Any]
+NodeKey: TypeAlias = tuple[str, str, str, str]  # class, field, field_type, token
+
+node_fields: tuple[str, ...] = ("class", "field", "field_type", "token")
+
+VERSION: int = 1
+
+
+def node_key(node: dict[str, str]) -> NodeKey:
+    return (
+        node.get("class", ""),
+        node.get("field", ""),
+        node.get("field_type", ""),
+        node.get("token", ""),
+    )
+
+
+def source_hash(fname: str) -> str:
+    with open(fname) as f:
+        return hashlib.sha256(f.read().encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class Entry:
+    mtime: int  # of the TOML, in ns
+    size: int
+    source: Optional[str]
+    hash: Optional[str]
+    error: Optional[str]
+    pragmas: frozenset[str]
+    tokens: frozenset[str]
+    nodes: frozenset[NodeKey]
+    source_mtime: int = -1  # mtime of the source when its hash was checked
+    verified: bool = False
+
+
+def load_entry(fname: str, st: os.stat_result) -> Entry:
+    with open(fname, "rb") as f:
+        container: Container = tomllib.load(f)
+    return Entry(
+        st.st_mtime_ns,
+        st.st_size,
+        container.get("source"),
+        container.get("hash"),
+        container.get("error"),
+        frozenset(container.get("pragmas", [])),
+        frozenset(container.get("tokens", [])),
+        frozenset(node_key(n) for n in container.get("nodes", [])),
+    )
+
+
+@dataclass
+class Index:
+    entries: dict[str, Entry] = field(default_factory=dict)
+    errors: dict[str, set[str]] = field(default_factory=dict)
+    pragmas: dict[str, set[str]] = field(default_factory=dict)
+    tokens: dict[str, set[str]] = field(default_factory=dict)
+    nodes: dict[NodeKey, set[str]] = field(default_factory=dict)
+    has_pragmas: set[str] = field(default_factory=set)
+    has_nodes: set[str] = field(default_factory=set)
+    dirty: bool = field(default=False, compare=False)
+
+    @staticmethod
+    def load(path: str) -> "Index":
+        try:
+            with open(path, "rb") as f:
+                version, index = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return Index()
+        if version != VERSION or not isinstance(index, Index):
+            return Index()
+        return index
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((VERSION, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Only the entries are stored; the postings are cheap to rebuild.
+        return {"entries": self.entries}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.entries = state["entries"]
+        self.dirty = False
+        self.rebuild()
+
+    def refresh(self, fnames: list[str]) -> None:
+        # Re-read the TOMLs that are new or changed on disk, and forget
+        # those that no longer exist.
+        changed = False
+        for fname in [f for f in self.entries if not os.path.exists(f)]:
+            del self.entries[fname]
+            changed = True
+        for fname in fnames:
+            st = os.stat(fname)
+            entry = self.entries.get(fname)
+            if entry is None or entry.mtime != st.st_mtime_ns or entry.size != st.st_size:
+                self.entries[fname] = load_entry(fname, st)
+                changed = True
+        if changed:
+            self.rebuild()
+            self.dirty = True
+
+    def rebuild(self) -> None:
+        self.errors, self.pragmas, self.tokens, self.nodes = {}, {}, {}, {}
+        self.has_pragmas, self.has_nodes = set(), set()
+        for fname, entry in self.entries.items():
+            if entry.error is not None:
+                self.errors.setdefault(entry.error, set()).add(fname)
+            if entry.pragmas:
+                self.has_pragmas.add(fname)
+            for pragma in entry.pragmas:
+                self.pragmas.setdefault(pragma, set()).add(fname)
+            for token in entry.tokens:
+                self.tokens.setdefault(token, set()).add(fname)
+            if entry.nodes:
+                self.has_nodes.add(fname)
+            for key in entry.nodes:
+                self.nodes.setdefault(key, set()).add(fname)
+
+    def verify(self, fname: str) -> Optional[str]:
+        # None if fname's source still hashes to the recorded hash, else the
+        # message mkcharacter.process used to print.
+        entry = self.entries[fname]
+        if entry.source is None:
+            return f"{fname} has no source"
+        if entry.hash is None:
+            return f"{fname} has no hash"
+        mtime = os.stat(entry.source).st_mtime_ns
+        if mtime != entry.source_mtime:
+            entry.verified = source_hash(entry.source) == entry.hash
+            entry.source_mtime = mtime
+            self.dirty = True
+        return None if entry.verified else f"{fname} does not match hash"
+
+    def match(self, pattern: Container, universe: set[str]) -> set[str]:
+        # The files in `universe` that mkcharacter.match(pattern, ...) accepts.
+        result = set(universe)
+        if "error" in pattern:
+            if pattern["error"] == "*":
+                result &= {f for f in result if self.entries[f].error is not None}
+            else:
+                result &= self.errors.get(pattern["error"], set())
+        if "pragmas" in pattern:
+            result &= self.has_pragmas
+            for pragma in pattern["pragmas"]:
+                result &= self.pragmas.get(pragma, set())
+        if "tokens" in pattern:
+            any_token: set[str] = set()
+            for token in pattern["tokens"]:
+                any_token |= self.tokens.get(token, set())
+            result &= any_token
+        if "nodes" in pattern:
+            result &= self.has_nodes
+            for p in pattern["nodes"]:
+                result &= self.node_files(p)
+        return result
+
+    def node_files(self, p: dict[str, str]) -> set[str]:
+        # Pattern nodes may give any subset of the node fields.
+        # Characterized nodes never hold other keys or empty values.
+        if any(k not in node_fields or v == "" for k, v in p.items()):
+            return set()
+        if len(p) == len(node_fields):
+            return self.nodes.get(node_key(p), set())
+        want = [(i, p[k]) for i, k in enumerate(node_fields) if k in p]
+        files: set[str] = set()
+        for key, fnames in self.nodes.items():
+            if all(key[i] == v for i, v in want):
+                files |= fnames
+        return files
+
+    def keep(self, pattern: Container, universe: set[str]) -> set[str]:
+        result = set(universe)
+        for require in pattern.get("require", []):
+            result &= self.match(require, result)
+        for exclude in pattern.get("exclude", []):
+            result -= self.match(exclude, result)
+        return result
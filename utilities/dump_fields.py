@@ -1,5 +1,6 @@
-from typing import Any, Callable
+from typing import Any, Callable, Iterator, Optional
 from tau import asts
+from tau.utilities import walker
 
 excludes: set[str] = {
     "span",
@@ -10,17 +11,40 @@ excludes: set[str] = {
 }
 
 
-def all_slots(obj: asts.AST) -> set[str]:
-    slots: set[str] = set()
-    cls: type
-    for cls in obj.__class__.__mro__:
-        slots.update(getattr(cls, "__slots__", []))
-    return slots
+_class_slots: dict[type, tuple[str, tuple[str, ...]]] = {}
+
+
+def class_slots(cls: type) -> tuple[str, tuple[str, ...]]:
+    # (class name, slots minus excludes), computed once per class.
+    if cls not in _class_slots:
+        slots: set[str] = set()
+        for c in cls.__mro__:
+            slots.update(getattr(c, "__slots__", []))
+        kept = tuple(slot for slot in slots if slot not in excludes)
+        _class_slots[cls] = (cls.__name__, kept)
+    return _class_slots[cls]
 
 
 def mk_fn() -> tuple[Callable[[asts.AST], None], list[dict[str, str]]]:
     found: list[dict[str, str]] = []
-    seen: set[tuple[str, ...]] = set()
+    return mk_dump(found.append), found
+
+
+def stream(
+    tree: asts.AST, types: Optional[tuple[type, ...]] = None
+) -> Iterator[dict[str, str]]:
+    # Same dicts, in the same order, as mk_fn() over a Visitor walk, but
+    # produced lazily so callers can filter by node type or stop early.
+    pending: list[dict[str, str]] = []
+    dump = mk_dump(pending.append)
+    for node in walker.nodes(tree, types):
+        dump(node)
+        yield from pending
+        pending.clear()
+
+
+def mk_dump(emit: Callable[[dict[str, str]], None]) -> Callable[[asts.AST], None]:
+    seen: set[tuple[str, str, str, str]] = set()
 
     def log(cls: str, slot: str, vtype: str, kind: str) -> None:
         tup = (cls, slot, vtype, kind)
@@ -33,37 +57,22 @@ def mk_fn() -> tuple[Callable[[asts.AST], None], list[dict[str, str]]]:
                 d["field_type"] = vtype
             if kind:
                 d["token"] = kind
-            found.append(d)
+            emit(d)
 
     def dump(ast: asts.AST) -> None:
-        slots = all_slots(ast)
-        field: bool = False
+        cls, slots = class_slots(ast.__class__)
+        if not slots:
+            log(cls, "", "", "")
+            return
         for slot in slots:
-            if slot in excludes:
-                continue
-            field = True
-            cls = ast.__class__.__name__
-            assert cls is not None, f"{ast.__class__.__name__} is None"
-            v: Any | None = getattr(ast, slot) if hasattr(ast, slot) else None
-            vtype: Any | str = v.__class__.__name__
-            assert (
-                vtype is not None
-            ), f"{ast.__class__.__name__}:{slot} is None"
+            v: Any | None = getattr(ast, slot, None)
             if isinstance(v, list):
-                if len(v) == 0: # type: ignore
-                    field_type = "<empty>"
-                    log(cls, slot, field_type, "")
+                if len(v) == 0:  # type: ignore
+                    log(cls, slot, "<empty>", "")
                 else:
-                    for i in v: # type: ignore
-                        assert isinstance(i.__class__, type) # type: ignore
-                        field_type = i.__class__.__name__ # type: ignore
-                        log(cls, slot, field_type, "")
+                    for i in v:  # type: ignore
+                        log(cls, slot, i.__class__.__name__, "")  # type: ignore
                 continue
-            kind = getattr(v, "kind", "")
-            log(cls, slot, vtype, kind)
-        if not field:
-            cls = ast.__class__.__name__
-            assert cls is not None, f"{ast.__class__.__name__} is None"
-            log(cls, "", "", "")
+            log(cls, slot, v.__class__.__name__, getattr(v, "kind", ""))
 
-    return dump, found
+    return dump
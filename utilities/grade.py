@@ -0,0 +1,254 @@
+from argparse import Namespace, ArgumentParser
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from typing import Any, Optional, Sequence
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import sys
+import tempfile
+import time
+
+from testerator.gradescope import do_gradescope
+
+from tau.utilities import bundle
+from tau.utilities.mkpickles import capture, judge, resolve
+
+# Runs the test cases of milestone pickles across a pool of forked workers,
+# so a submission that loops forever or allocates without bound only costs
+# the test that triggers it: its worker is killed at --timeout seconds (and
+# replaced), and every worker's address space is capped at --memory MiB.
+# Student modules are imported in the workers, never in the grading process.
+#
+# Scoring is left to testerator: each outcome becomes a case whose function
+# returns the outcome and whose compare fails with its message, and
+# do_gradescope() grades those cases.  Thresholds, late penalties and the
+# results.json layout are therefore exactly those of a serial run.
+
+Outcome = tuple[bool, str]  # (passed, output shown to the student)
+
+
+def worker(
+    conn: Connection, cases: Sequence[dict[str, Any]], memory: int, directory: str
+) -> None:
+    # Runs the cases whose indices arrive on conn until it receives None,
+    # importing the student's modules from `directory` if given.
+    if directory:
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+    if memory > 0:
+        limit = memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while (i := conn.recv()) is not None:
+        case = cases[i]
+        output, stdout, _, error = capture(resolve(case["function"]), case["input"])
+        problem = judge(case, output, stdout, error)
+        conn.send((problem is None, problem or "passed"))
+
+
+@dataclass
+class Worker:
+    proc: Any
+    conn: Connection
+    case: int = -1  # index of the running case, or -1 when idle
+    deadline: float = 0.0
+
+
+def run_cases(
+    cases: Sequence[dict[str, Any]],
+    jobs: int,
+    timeout: float,
+    memory: int,
+    directory: str = "",
+) -> list[Outcome]:
+    # Workers are forked after the cases are loaded, so only indices cross
+    # the pipes.  A worker that times out or dies is replaced.
+    ctx = multiprocessing.get_context("fork")
+
+    def spawn() -> Worker:
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(
+            target=worker, args=(child, cases, memory, directory), daemon=True
+        )
+        proc.start()
+        child.close()
+        return Worker(proc, parent)
+
+    def retire(w: Worker) -> None:
+        w.proc.kill()
+        w.proc.join()
+        w.conn.close()
+
+    outcomes: list[Optional[Outcome]] = [None] * len(cases)
+    workers = [spawn() for _ in range(min(jobs, len(cases)))]
+    next_case = 0
+    while True:
+        for w in workers:
+            if w.case < 0 and next_case < len(cases):
+                w.conn.send(next_case)
+                w.case, w.deadline = next_case, time.monotonic() + timeout
+                next_case += 1
+        busy = [w for w in workers if w.case >= 0]
+        if not busy:
+            break
+        deadline = min(w.deadline for w in busy)
+        ready = wait([w.conn for w in busy], timeout=max(0.0, deadline - time.monotonic()))
+        now = time.monotonic()
+        for k, w in enumerate(workers):
+            if w.case < 0:
+                continue
+            if w.conn in ready:
+                try:
+                    outcomes[w.case] = w.conn.recv()
+                    w.case = -1
+                    continue
+                except EOFError:
+                    w.proc.join()
+                    outcomes[w.case] = (False, f"Crashed (exit code {w.proc.exitcode})")
+            elif now >= w.deadline:
+                outcomes[w.case] = (False, f"Timed out after {timeout:g} seconds")
+            else:
+                continue
+            retire(w)
+            workers[k] = spawn()
+    for w in workers:
+        w.conn.send(None)
+        w.proc.join()
+    return [outcome for outcome in outcomes if outcome is not None]
+
+
+def verdict(outcome: Outcome) -> Outcome:
+    return outcome
+
+
+def check_verdict(student: Outcome, expected: Outcome, crash: bool) -> bool:
+    passed, message = student
+    if not passed:
+        if crash:
+            raise Exception(message)
+        return False
+    return True
+
+
+def verdict_cases(names: list[str], outcomes: list[Outcome]) -> list[dict[str, Any]]:
+    return [
+        {
+            "file": name,
+            "function": "tau.utilities.grade.verdict",
+            "compare": "tau.utilities.grade.check_verdict",
+            "input": outcome,
+            "output": (True, "passed"),
+            "stdout": "",
+            "stderr": "",
+            "error": None,
+        }
+        for name, outcome in zip(names, outcomes)
+    ]
+
+
+def load_cases(inputs: list[str]) -> Sequence[dict[str, Any]]:
+    # A single bundle stays lazily loaded; workers unpickle only the cases
+    # they run.
+    if len(inputs) == 1:
+        return bundle.load(inputs[0])
+    cases: list[dict[str, Any]] = []
+    for fname in inputs:
+        cases.extend(bundle.load(fname))
+    return cases
+
+
+def grade(
+    inputs: list[str],
+    output: str,
+    threshold: Optional[float],
+    minutes: float,
+    previous_score: float,
+    jobs: Optional[int] = None,
+    timeout: float = 10.0,
+    memory: int = 2048,
+) -> dict[str, Any]:
+    return grade_cases(
+        load_cases(inputs),
+        output,
+        threshold,
+        minutes,
+        previous_score,
+        jobs,
+        timeout,
+        memory,
+    )
+
+
+def grade_cases(
+    cases: Sequence[dict[str, Any]],
+    output: str,
+    threshold: Optional[float],
+    minutes: float,
+    previous_score: float,
+    jobs: Optional[int] = None,
+    timeout: float = 10.0,
+    memory: int = 2048,
+    directory: str = "",
+) -> dict[str, Any]:
+    outcomes = run_cases(
+        cases, jobs or os.cpu_count() or 1, timeout, memory, directory
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        verdicts = os.path.join(tmp, "verdicts.pickle")
+        with open(verdicts, "wb") as f:
+            pickle.dump(verdict_cases(bundle.files(cases), outcomes), f)
+        do_gradescope([verdicts], output, threshold, minutes, previous_score)
+    with open(output) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    args: Namespace = get_args()
+    cases = load_cases(args.pickles)
+    if args.only:
+        if isinstance(cases, bundle.Bundle):
+            cases = cases.select(args.only)
+        else:
+            cases = [case for case in cases if case["file"] in args.only]
+    results = grade_cases(
+        cases,
+        args.output,
+        args.threshold,
+        0.0,
+        0.0,
+        args.jobs,
+        args.timeout,
+        args.memory,
+    )
+    print(f"Score: {results['score']}")
+    for test in results.get("tests", []):
+        if test.get("score", 0) < test.get("max_score", 0):
+            print(f"{test.get('name', '?')}: {test.get('output', '')}")
+
+
+def get_args() -> Namespace:
+    ap: ArgumentParser = ArgumentParser(description="Grade milestone pickles in parallel")
+    ap.add_argument("pickles", nargs="+", help="milestone pickles or bundles")
+    ap.add_argument(
+        "--only", type=str, nargs="+", default=[], help="grade only these test files"
+    )
+    ap.add_argument("--output", type=str, default="results.json", help="results JSON")
+    ap.add_argument("--threshold", type=float, default=None, help="all-or-nothing pass fraction")
+    add_limits(ap)
+    return ap.parse_args()
+
+
+def add_limits(ap: ArgumentParser) -> None:
+    ap.add_argument("--jobs", type=int, default=None, help="tests run at once")
+    ap.add_argument(
+        "--timeout", type=float, default=10.0, help="wall-clock seconds per test"
+    )
+    ap.add_argument(
+        "--memory", type=int, default=2048, help="address space MiB per test (0: none)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,118 @@
 import json
 import argparse
 import datetime
-from typing import Optional, Any
+import os
+import socketserver
+import stat
+import sys
+import tomllib
+from typing import Optional, Any, Sequence, TextIO
 
 from testerator.gradescope import do_gradescope
 
+from tau.utilities import bundle, grade
+
+
+def read_metadata(path: str, log: TextIO = sys.stdout) -> tuple[str, float, float]:
+    # (title, minutes late, previous score) from Gradescope's metadata.
+    with open(path, "r") as f:
+        submission = json.load(f)
+        title = submission["assignment"]["title"]
+        due_date: str = submission["assignment"]["due_date"]
+        created_at: str = submission["created_at"]
+        due_date_time = datetime.datetime.strptime(
+            due_date, "%Y-%m-%dT%H:%M:%S.%f%z"
+        )
+        created_date_time = datetime.datetime.strptime(
+            created_at, "%Y-%m-%dT%H:%M:%S.%f%z"
+        )
+        late: datetime.timedelta = created_date_time - due_date_time
+        minutes = late.total_seconds() / 60
+        # minutes = max(minutes, 0)
+        previous_submissions: list[dict[str, Any]] = submission[
+            "previous_submissions"
+        ]
+        if minutes > 0:
+            print(f"Minutes late: {minutes}", file=log)
+        else:
+            print(f"Minutes early: {-minutes}", file=log)
+        previous_score = 0.0
+        if len(previous_submissions) > 0:
+            most_recent = max(
+                previous_submissions, key=lambda x: x["submission_time"]
+            )
+            previous_score = float(most_recent["score"])
+            print(f"Previous score: {previous_score}", file=log)
+    return title, minutes, previous_score
+
+
+def load_graders(path: str) -> list[dict[str, Any]]:
+    if path.endswith(".toml"):
+        with open(path, "rb") as f:
+            return tomllib.load(f)["graders"]
+    with open(path, "r") as f:
+        return json.load(f)["graders"]
+
+
+def normalize(title: str) -> str:
+    return " ".join(title.split()).casefold()
+
+
+class GraderIndex:
+    # Finds the first grader (in file order) whose name is a prefix of a
+    # title with one dict lookup per distinct name length, instead of a
+    # startswith() scan over every grader.
+    graders: list[dict[str, Any]]
+    names: dict[str, int]  # normalized name -> position in graders
+    lengths: list[int]
+
+    def __init__(self, graders: list[dict[str, Any]]) -> None:
+        self.graders = graders
+        self.names = {}
+        for i, grader in enumerate(graders):
+            self.names.setdefault(normalize(grader["name"]), i)
+        self.lengths = sorted({len(name) for name in self.names})
+
+    def find(self, title: str) -> Optional[dict[str, Any]]:
+        key = normalize(title)
+        hits = [
+            self.names[key[:n]]
+            for n in self.lengths
+            if n <= len(key) and key[:n] in self.names
+        ]
+        return self.graders[min(hits)] if hits else None
+
+
+def write_pass(output: str) -> None:
+    results: dict[str, Any] = {
+        "score": 100.0,
+        "output": "Test passed",
+        "output_format": "simple_format",
+        "stdout_visibility": "visible",
+    }
+    # write results to /autograder/results/results.json
+    with open(output, "w") as f:
+        json.dump(results, f)
+
 
 def main() -> None:
     args = get_args()
+    if args.serve or args.socket:
+        serve(args)
+        return
     title: str = ""
     minutes: float = 0.0
     previous_score: float = 0.0
-    args.use_best
     if args.title:
         title = args.title
     else:
-        with open("/autograder/submission_metadata.json", "r") as f:
-            submission = json.load(f)
-            title = submission["assignment"]["title"]
-            due_date: str = submission["assignment"]["due_date"]
-            created_at: str = submission["created_at"]
-            due_date_time = datetime.datetime.strptime(
-                due_date, "%Y-%m-%dT%H:%M:%S.%f%z"
-            )
-            created_date_time = datetime.datetime.strptime(
-                created_at, "%Y-%m-%dT%H:%M:%S.%f%z"
-            )
-            late: datetime.timedelta = created_date_time - due_date_time
-            minutes = late.total_seconds() / 60
-            # minutes = max(minutes, 0)
-            previous_submissions: list[dict[str, Any]] = submission[
-                "previous_submissions"
-            ]
-            if minutes > 0:
-                print(f"Minutes late: {minutes}")
-            else:
-                print(f"Minutes early: {-minutes}")
-            previous_score = 0.0
-            if len(previous_submissions) > 0:
-                most_recent = max(
-                    previous_submissions, key=lambda x: x["submission_time"]
-                )
-                previous_score = float(most_recent["score"])
-                print(f"Previous score: {previous_score}")
+        title, minutes, previous_score = read_metadata(
+            "/autograder/submission_metadata.json"
+        )
 
     print(f"Assignment/Milestone title: {title}")
-    found: Optional[dict[str, Any]] = None
-    with open("./tau/milestones/graders.json", "r") as f:
-        graders = json.load(f)
-        grader: dict[str, Any]
-        for grader in graders["graders"]:
-            grader_title: str = grader["name"]
-            if title.startswith(grader_title):
-                found = grader
-                break
+    graders = load_graders(args.graders)
+    found: Optional[dict[str, Any]] = GraderIndex(graders).find(title)
     print(f"Found grader: {found}")
     assert found is not None, f"{graders}"
 
@@ -68,26 +127,136 @@ def main() -> None:
         output = "/autograder/results/results.json"
     match found["tester"]:
         case "pass":
-            results: dict[str, Any] = {
-                "score": 100.0,
-                "output": "Test passed",
-                "output_format": "simple_format",
-                "stdout_visibility": "visible",
-            }
-            # write results to /autograder/results/results.json
-            with open(output, "w") as f:
-                json.dump(results, f)
+            write_pass(output)
         case "testerator":
-            fname = "./tau/milestones/" + found["pickle"]
+            fname = os.path.join(os.path.dirname(args.graders), found["pickle"])
             inputs: list[str] = [fname]
             threshold: Optional[float] = (
                 found["threshold"] if "threshold" in found else None
             )
-            do_gradescope(inputs, output, threshold, minutes, previous_score)
+            if args.parallel or bundle.is_bundle(fname):
+                # testerator only reads whole pickles, so bundles are always
+                # graded by grade's workers; without --parallel, one worker.
+                grade.grade(
+                    inputs,
+                    output,
+                    threshold,
+                    minutes,
+                    previous_score,
+                    args.jobs if args.parallel else 1,
+                    args.timeout,
+                    args.memory,
+                )
+            else:
+                do_gradescope(inputs, output, threshold, minutes, previous_score)
         case _:
             raise NotImplementedError(f"Unknown tester type: {found['tester']}")
 
 
+class Service:
+    # Grades many submissions from one process: the grader table is indexed
+    # once and each milestone pickle or bundle is loaded on first use and
+    # kept.  Tests always run in grade's forked workers, which import each
+    # submission's modules from its own directory, so nothing from one
+    # submission leaks into the next.
+    index: GraderIndex
+    directory: str  # where the pickles live
+    args: argparse.Namespace
+    cases: dict[str, Sequence[dict[str, Any]]]
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.index = GraderIndex(load_graders(args.graders))
+        self.directory = os.path.dirname(os.path.abspath(args.graders))
+        self.args = args
+        self.cases = {}
+        if args.preload:
+            for grader in self.index.graders:
+                if "pickle" in grader:
+                    self.load(grader["pickle"])
+
+    def load(self, name: str) -> Sequence[dict[str, Any]]:
+        if name not in self.cases:
+            self.cases[name] = grade.load_cases([os.path.join(self.directory, name)])
+        return self.cases[name]
+
+    def handle(self, job: dict[str, Any]) -> dict[str, Any]:
+        # job: {"title" or "metadata", "output", optional "directory" (the
+        # submission's top level) and "use_best"}.
+        minutes: float = job.get("minutes", 0.0)
+        previous_score: float = job.get("previous_score", 0.0)
+        if "metadata" in job:
+            # stdout may be the reply stream
+            title, minutes, previous_score = read_metadata(job["metadata"], sys.stderr)
+        else:
+            title = job["title"]
+        found = self.index.find(title)
+        if found is None:
+            return {"title": title, "error": "no grader matches title"}
+        if not (job.get("use_best", False) or found.get("use_best", False)):
+            previous_score = 0.0
+        output: str = job["output"]
+        match found["tester"]:
+            case "pass":
+                write_pass(output)
+                score = 100.0
+            case "testerator":
+                results = grade.grade_cases(
+                    self.load(found["pickle"]),
+                    output,
+                    found.get("threshold"),
+                    minutes,
+                    previous_score,
+                    self.args.jobs,
+                    self.args.timeout,
+                    self.args.memory,
+                    os.path.abspath(job.get("directory", ".")),
+                )
+                score = results["score"]
+            case _:
+                return {"title": title, "error": f"unknown tester {found['tester']}"}
+        return {"title": title, "grader": found["name"], "score": score, "output": output}
+
+    def respond(self, line: str) -> str:
+        try:
+            reply = self.handle(json.loads(line))
+        except Exception as e:
+            reply = {"error": f"{e.__class__.__name__}: {e}"}
+        return json.dumps(reply)
+
+
+def serve_stream(service: Service, jobs: TextIO, replies: TextIO) -> None:
+    # One JSON job per line in, one JSON reply per line out.
+    for line in jobs:
+        if line.strip():
+            print(service.respond(line), file=replies, flush=True)
+
+
+def is_socket(path: str) -> bool:
+    return stat.S_ISSOCK(os.stat(path).st_mode)
+
+
+def serve(args: argparse.Namespace) -> None:
+    service = Service(args)
+    if not args.socket:
+        serve_stream(service, sys.stdin, sys.stdout)
+        return
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                if line.strip():
+                    reply = service.respond(line.decode("utf-8")) + "\n"
+                    self.wfile.write(reply.encode("utf-8"))
+                    self.wfile.flush()
+
+    if os.path.exists(args.socket):
+        if not is_socket(args.socket):
+            raise Exception(f"{args.socket} exists and is not a socket")
+        os.remove(args.socket)  # left over from an earlier run
+    with socketserver.UnixStreamServer(args.socket, Handler) as server:
+        server.serve_forever()
+
+
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -105,7 +274,39 @@ def get_args():
     parser.add_argument(
         "--use_best", action="store_true", default=False, help="Use best score so far"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        default=False,
+        help="Run tests in isolated worker processes with per-test limits "
+        "(bundles always do, with one worker unless this is given)",
+    )
+    parser.add_argument(
+        "--graders",
+        type=str,
+        default="./tau/milestones/graders.json",
+        help="graders.json or graders.toml",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        default=False,
+        help="Grade JSON jobs read line by line from stdin",
+    )
+    parser.add_argument(
+        "--socket", type=str, default="", help="Serve jobs on this Unix socket"
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        default=False,
+        help="Load every milestone pickle when the service starts",
+    )
+    grade.add_limits(parser)
+    args = parser.parse_args()
+    if args.socket and os.path.exists(args.socket) and not is_socket(args.socket):
+        parser.error(f"{args.socket} exists and is not a socket")
+    return args
 
 
 if __name__ == "__main__":
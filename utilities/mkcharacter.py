@@ -1,6 +1,8 @@
 from argparse import Namespace, ArgumentParser
-from typing import Callable, TypeAlias, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, TypeAlias, Any
 import hashlib
+import os
 
 # import pprint
 
@@ -10,7 +12,7 @@ import tomllib
 from parse import ParseErrorException
 from tau.asts import AST
 from tau.error import CompileError
-from tau.utilities import dump_fields, visitor
+from tau.utilities import char_index, dump_fields, table_visitor
 
 import scanner
 from tau.asts import Program
@@ -29,8 +31,7 @@ def do_tree(ast: AST) -> list[dict[str, str]]:
     dmp: Callable[[AST], None]
     found: list[dict[str, str]]
     dmp, found = dump_fields.mk_fn()
-    v = visitor.Visitor(dmp)
-    v.AST(ast)
+    table_visitor.TableVisitor(dmp).walk(ast)
     return found
 
 
@@ -104,6 +105,27 @@ def process(patternname: str, fnames: list[str], verify: bool) -> None:
             print(container["source"])
 
 
+def process_indexed(
+    patternname: str, fnames: list[str], verify: bool, indexname: str
+) -> None:
+    # Same output as process(), answered from a persistent index.
+    with open(patternname, "rb") as f:
+        pattern: Container = tomllib.load(f)
+    index = char_index.Index.load(indexname)
+    index.refresh(fnames)
+    kept = index.keep(pattern, set(fnames))
+    for fname in fnames:
+        if verify:
+            problem = index.verify(fname)
+            if problem is not None:
+                print(problem)
+                continue
+        if fname in kept:
+            print(index.entries[fname].source)
+    if index.dirty:
+        index.save(indexname)
+
+
 def main() -> None:
     args: Namespace = get_args()
 
@@ -111,15 +133,36 @@ def main() -> None:
         case "match":
             patternname = args.pattern
             files = args.files
-            process(patternname, files, args.verify)
+            if args.index:
+                process_indexed(patternname, files, args.verify, args.index)
+            else:
+                process(patternname, files, args.verify)
         case "characterize":
-            fname: str = args.file[0]
-            outname: str = args.output
-            characterize(fname, outname)
+            if args.output:
+                characterize(args.file[0], args.output)
+            else:
+                characterize_all(args.file, args.output_dir, args.jobs, args.force)
         case _:
             assert False, f"unknown command {args.command}"
 
 
+# Passes that decorate the tree; the characterization describes the tree
+# after the last of these that succeeds.
+decorators: list[Callable[[Program], None]] = [
+    bindings.process,
+    typecheck.process,
+    offsets.process,
+    assign.process,
+]
+
+
+def replay(input: str, count: int) -> Program:
+    tree: Program = parse.Parser(scanner.Scanner(input)).parse()
+    for process in decorators[:count]:
+        process(tree)
+    return tree
+
+
 def characterize(fname: str, outname: str):
     input: str
     with open(fname) as f:
@@ -142,24 +185,18 @@ def characterize(fname: str, outname: str):
     if pragmas:
         container["pragmas"] = list(pragmas)
 
+    tree: Optional[Program] = None
+    completed: int = 0  # passes in `decorators` that finished
     try:
         lexer = scanner.Scanner(input)
         container["tokens"] = list(set(t.kind for t in lexer.tokens))
 
         psr = parse.Parser(lexer)
-        tree: Program = psr.parse()
-        container["nodes"] = do_tree(tree)
-
-        bindings.process(tree)
-        container["nodes"] = do_tree(tree)
-
-        typecheck.process(tree)
-        container["nodes"] = do_tree(tree)
-
-        offsets.process(tree)
-        container["nodes"] = do_tree(tree)
+        tree = psr.parse()
 
-        assign.process(tree)
+        for process in decorators:
+            process(tree)
+            completed += 1
         container["nodes"] = do_tree(tree)
 
         _: list[Insn] = codegen.process(tree)
@@ -169,10 +206,71 @@ def characterize(fname: str, outname: str):
     except ParseErrorException as e:
         container["error"] = str(e.__class__.__name__)
 
+    if tree is not None and "nodes" not in container:
+        # A pass failed part way through decorating the tree, so describe the
+        # tree as the last successful pass left it by replaying those passes
+        # on a fresh parse.
+        container["nodes"] = do_tree(replay(input, completed))
+
     with open(outname, "w") as f:
         print(dumps(container), file=f) # type: ignore
 
 
+def up_to_date(fname: str, outname: str) -> bool:
+    # An existing TOML is reused when it records the hash of the current
+    # source.
+    if not os.path.exists(outname):
+        return False
+    try:
+        with open(outname, "rb") as f:
+            container: Container = tomllib.load(f)
+    except tomllib.TOMLDecodeError:
+        return False
+    with open(fname) as f:
+        hash = hashlib.sha256(f.read().encode("utf-8")).hexdigest()
+    return container.get("hash") == hash
+
+
+def characterize_one(fname: str, outname: str) -> Optional[str]:
+    # Worker entry point: report failures rather than losing the whole batch.
+    try:
+        characterize(fname, outname)
+    except Exception as e:
+        return f"{e.__class__.__name__}: {e}"
+    return None
+
+
+def characterize_all(
+    fnames: list[str], outdir: str, jobs: Optional[int], force: bool
+) -> None:
+    todo: list[tuple[str, str]] = []
+    for fname in fnames:
+        basename = os.path.splitext(os.path.basename(fname))[0]
+        outname = os.path.join(outdir, basename + ".toml")
+        if not force and up_to_date(fname, outname):
+            continue
+        todo.append((fname, outname))
+    print(f"Characterizing {len(todo)} of {len(fnames)} files")
+    if not todo:
+        return
+    os.makedirs(outdir, exist_ok=True)
+    sources = [fname for fname, _ in todo]
+    outnames = [outname for _, outname in todo]
+    results: list[Optional[str]]
+    if jobs == 1 or len(todo) == 1:
+        results = list(map(characterize_one, sources, outnames))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            workers = jobs or os.cpu_count() or 1
+            chunksize = max(1, len(todo) // (workers * 4))
+            results = list(pool.map(characterize_one, sources, outnames, chunksize=chunksize))
+    for fname, outname, failure in zip(sources, outnames, results):
+        if failure is None:
+            print(f"Processed {fname} {outname}")
+        else:
+            print(f"FAILED {fname}: {failure}")
+
+
 def get_args() -> Namespace:
     ap: ArgumentParser = ArgumentParser(description="Compile Tau files")
     # create subparsers
@@ -180,9 +278,19 @@ def get_args() -> Namespace:
     characterize = command.add_parser(
         "characterize", help="characterize source file"
     )
-    characterize.add_argument("file", nargs=1, help="source file")
+    characterize.add_argument("file", nargs="+", help="source files")
+    output = characterize.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output", type=str, help="output file (single source)")
+    output.add_argument(
+        "--output-dir", type=str, help="directory for one TOML per source"
+    )
     characterize.add_argument(
-        "--output", type=str, required=True, help="output file"
+        "--jobs", type=int, default=None, help="worker processes for --output-dir"
+    )
+    characterize.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate TOMLs whose hash already matches the source",
     )
     match = command.add_parser(
         "match", help="match pattern TOML to characterized TOML files"
@@ -194,8 +302,22 @@ def get_args() -> Namespace:
     match.add_argument(
         "--verify", action="store_true", help="verify files match hashes"
     )
+    match.add_argument(
+        "--index",
+        type=str,
+        default="",
+        help="persistent index of the TOMLs (created or refreshed as needed)",
+    )
 
-    return ap.parse_args()
+    args = ap.parse_args()
+    if args.command == "characterize":
+        if args.output and len(args.file) != 1:
+            characterize.error("--output takes exactly one source file")
+        if args.jobs is not None and not args.output_dir:
+            characterize.error("--jobs only applies with --output-dir")
+        if args.jobs is not None and args.jobs < 1:
+            characterize.error("--jobs must be at least 1")
+    return args
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+from argparse import Namespace, ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import contextlib
+import importlib
+import io
+import os
+import pickle
+import tomllib
+
+from tau import testers
+from tau.utilities import bundle
+
+# Builds every milestone pickle in one run, replacing the create/run pair of
+# testerator invocations per spec in mkpickles.sh.  Work is split by source
+# file rather than by spec: each worker compiles a source once, recording the
+# tree after every stage some spec asks for, so a file listed by m6 through
+# m14 is parsed and decorated once instead of once per milestone.  Each
+# record is then checked by rerunning the spec's function from scratch and
+# comparing with the spec's compare function, which produces the .verify
+# reports.
+
+Step = Callable[[Any], Any]
+
+
+def resolve(dotted: str) -> Any:
+    module, _, name = dotted.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+def decorate(module: str) -> Step:
+    def step(tree: Any) -> Any:
+        importlib.import_module(module).process(tree)
+        return tree
+
+    return step
+
+
+def codegen_step(tree: Any) -> Any:
+    # The tail of testers.run_codegen after run_assign.
+    import codegen
+    from vm import vm_utils
+
+    vm_utils.invoke_vm(codegen.process(tree), [], False)
+    return tree
+
+
+# Each run_* below equals the previous one followed by its step, so one
+# compile can serve all of them.  Other functions are run on their own.
+chain: list[tuple[str, Step]] = [
+    ("tau.testers.run_ast", testers.run_ast),
+    ("tau.testers.run_binding", decorate("bindings")),
+    ("tau.testers.run_typecheck", decorate("typecheck")),
+    ("tau.testers.run_offsets", decorate("offsets")),
+    ("tau.testers.run_assign", decorate("assign")),
+    ("tau.testers.run_codegen", codegen_step),
+]
+chained: dict[str, int] = {name: i for i, (name, _) in enumerate(chain)}
+
+
+def capture(fn: Step, arg: Any) -> tuple[Any, str, str, Optional[Exception]]:
+    out, err = io.StringIO(), io.StringIO()
+    result: Any = None
+    error: Optional[Exception] = None
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            result = fn(arg)
+        except Exception as e:
+            error = e
+    return result, out.getvalue(), err.getvalue(), error
+
+
+def payload(input: str, output: Any, stdout: str, stderr: str, error: Any) -> bytes:
+    # Pickling right away also snapshots the tree before later stages
+    # decorate it further.
+    record = {
+        "input": input,
+        "output": output,
+        "stdout": stdout,
+        "stderr": stderr,
+        "error": error,
+    }
+    return pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def run_chain(input: str, wanted: set[str]) -> dict[str, bytes]:
+    records: dict[str, bytes] = {}
+    if not wanted:
+        return records
+    last = max(chained[name] for name in wanted)
+    value: Any = input
+    stdout = stderr = ""
+    for i, (name, step) in enumerate(chain[: last + 1]):
+        value, out, err, error = capture(step, value)
+        stdout += out
+        stderr += err
+        if error is not None:
+            for later, _ in chain[i : last + 1]:
+                if later in wanted:
+                    records[later] = payload(input, None, stdout, stderr, error)
+            break
+        if name in wanted:
+            records[name] = payload(input, value, stdout, stderr, None)
+    return records
+
+
+def judge(case: dict[str, Any], output: Any, stdout: str, error: Any) -> Optional[str]:
+    # None if a run matches the recorded case, else why it does not.
+    try:
+        if type(error) != type(case["error"]):
+            raise Exception(f"Expected error {case['error']!r}, but got {error!r}")
+        if error is None:
+            resolve(case["compare"])(output, case["output"], True)
+            if stdout != case["stdout"]:
+                raise Exception("stdout differs")
+    except Exception as e:
+        notes = "".join(f"\n    {note}" for note in getattr(e, "__notes__", []))
+        return f"{e}{notes}"
+    return None
+
+
+def verify(fname: str, function: str, compare: str, data: bytes) -> str:
+    expected: dict[str, Any] = pickle.loads(data)
+    expected["compare"] = compare
+    output, stdout, _, error = capture(resolve(function), expected["input"])
+    problem = judge(expected, output, stdout, error)
+    if problem is not None:
+        return f"{fname}: FAILED {problem}"
+    return f"{fname}: passed"
+
+
+def build(
+    fname: str, tests: list[tuple[str, str]], check: bool
+) -> tuple[dict[str, bytes], dict[tuple[str, str], str]]:
+    # Records for every function wanted for fname, plus a verify line for
+    # every (function, compare) pair.
+    with open(fname) as f:
+        input = f.read()
+    functions = {function for function, _ in tests}
+    records = run_chain(input, functions & chained.keys())
+    for function in functions - chained.keys():
+        records[function] = payload(input, *capture(resolve(function), input))
+    reports: dict[tuple[str, str], str] = {}
+    if check:
+        for function, compare in tests:
+            reports[(function, compare)] = verify(
+                fname, function, compare, records[function]
+            )
+    return records, reports
+
+
+def build_one(job: tuple[str, list[tuple[str, str]], bool]) -> Any:
+    return build(*job)
+
+
+def load_specs(specnames: list[str], listdir: str) -> list[tuple[str, dict[str, Any], list[str]]]:
+    specs: list[tuple[str, dict[str, Any], list[str]]] = []
+    for specname in specnames:
+        basename = os.path.splitext(os.path.basename(specname))[0]
+        listname = os.path.join(listdir, basename + ".list")
+        if not os.path.exists(listname):
+            print(f"ERROR: {listname} missing")
+            continue
+        with open(specname, "rb") as f:
+            spec: dict[str, Any] = tomllib.load(f)
+        if "function" not in spec:
+            print(f"ERROR: {specname} missing function")
+            continue
+        if "compare" not in spec:
+            print(f"ERROR: {specname} missing compare")
+            continue
+        with open(listname) as f:
+            fnames = f.read().split()
+        specs.append((basename, spec, fnames))
+    return specs
+
+
+def run(args: Namespace) -> None:
+    specnames: list[str] = args.specs or sorted(
+        os.path.join(args.spec_dir, f)
+        for f in os.listdir(args.spec_dir)
+        if f.endswith(".toml")
+    )
+    specs = load_specs(specnames, args.list_dir)
+    tests: dict[str, list[tuple[str, str]]] = {}
+    for _, spec, fnames in specs:
+        for fname in fnames:
+            pair = (spec["function"], spec["compare"])
+            if pair not in tests.setdefault(fname, []):
+                tests[fname].append(pair)
+    print(f"Building {len(specs)} pickles from {len(tests)} sources")
+
+    jobs = [(fname, pairs, not args.no_verify) for fname, pairs in tests.items()]
+    results: dict[str, tuple[dict[str, bytes], dict[tuple[str, str], str]]]
+    if args.jobs == 1 or len(jobs) <= 1:
+        results = dict(zip(tests, map(build_one, jobs)))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            workers = args.jobs or os.cpu_count() or 1
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = dict(zip(tests, pool.map(build_one, jobs, chunksize=chunksize)))
+
+    for basename, spec, fnames in specs:
+        function, compare = spec["function"], spec["compare"]
+        cases: list[dict[str, Any]] = []
+        lines: list[str] = []
+        for fname in fnames:
+            records, reports = results[fname]
+            case = {"file": fname, "function": function, "compare": compare}
+            case.update(pickle.loads(records[function]))
+            cases.append(case)
+            if (function, compare) in reports:
+                lines.append(reports[(function, compare)])
+        picklename = os.path.join(args.output_dir, f"{basename}.{args.format}")
+        if args.format == "bundle":
+            bundle.write(cases, picklename)
+        else:
+            with open(picklename, "wb") as out:
+                pickle.dump(cases, out)
+        if not args.no_verify:
+            with open(os.path.join(args.verify_dir, basename + ".verify"), "w") as f:
+                f.write("".join(line + "\n" for line in lines))
+        print(f"Wrote {picklename} ({len(cases)} tests)")
+
+
+def main() -> None:
+    args: Namespace = get_args()
+    run(args)
+
+
+def get_args() -> Namespace:
+    ap: ArgumentParser = ArgumentParser(description="Build milestone pickles")
+    ap.add_argument(
+        "specs", nargs="*", help="spec TOMLs (default: every spec in --spec-dir)"
+    )
+    ap.add_argument("--spec-dir", type=str, default="tau/milestones/specs")
+    ap.add_argument("--list-dir", type=str, default="tau/milestones/lists")
+    ap.add_argument("--output-dir", type=str, default="tau/milestones")
+    ap.add_argument("--verify-dir", type=str, default="/tmp")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes")
+    ap.add_argument(
+        "--format",
+        choices=["pickle", "bundle"],
+        default="pickle",
+        help="write monolithic pickles or lazily loaded bundles",
+    )
+    ap.add_argument(
+        "--no-verify", action="store_true", help="skip rerunning each test"
+    )
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    main()
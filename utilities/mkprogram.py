@@ -0,0 +1,261 @@
+import argparse
+import os
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import TextIO
+
+# Generates well-typed, terminating Tau programs (see docs/language.typ) for
+# scaling benchmarks.  Functions only call functions declared before them, so
+# the call graph is acyclic; every while loop runs a bounded counter; division
+# is only ever by a non-zero literal; array indices are in-bounds literals.
+# Run time still grows quickly with --call-density since calls sit inside
+# loops; use --call-density 0 for programs meant to be executed at scale.
+
+
+@dataclass
+class Shape:
+    functions: int = 10
+    params: int = 2
+    statements: int = 4  # statements per compound statement
+    nesting: int = 2  # depth of nested if/while
+    expr_depth: int = 3  # depth of BinaryOp chains
+    arrays: int = 1  # local arrays per function
+    array_length: int = 8
+    call_density: float = 0.2  # chance an expression leaf is a call
+    loop_count: int = 2  # iterations of each while loop
+    size: int = 0  # if non-zero, keep adding functions until this many bytes
+
+
+@dataclass
+class Function:
+    name: str
+    params: int
+
+
+@dataclass
+class Context:
+    ints: list[str]
+    arrays: list[str]
+    callees: list[Function]
+    fresh: list[int] = field(default_factory=lambda: [0])
+
+    def name(self, prefix: str) -> str:
+        self.fresh[0] += 1
+        return f"{prefix}{self.fresh[0]}"
+
+    def nested(self) -> "Context":
+        return Context(list(self.ints), list(self.arrays), self.callees, self.fresh)
+
+
+class Generator:
+    shape: Shape
+    rng: random.Random
+
+    def __init__(self, shape: Shape, seed: int) -> None:
+        self.shape = shape
+        self.rng = random.Random(seed)
+
+    def int_expr(self, ctx: Context, depth: int) -> str:
+        if depth <= 0:
+            return self.int_leaf(ctx)
+        op = self.rng.choice(["+", "-", "*", "/"])
+        left = self.int_expr(ctx, depth - 1)
+        if op == "/":
+            return f"({left} / {self.rng.randint(1, 9)})"
+        right = self.int_expr(ctx, depth - 1)
+        return f"({left} {op} {right})"
+
+    def int_leaf(self, ctx: Context) -> str:
+        if ctx.callees and self.rng.random() < self.shape.call_density:
+            callee = self.rng.choice(ctx.callees)
+            args = ", ".join(self.int_leaf_simple(ctx) for _ in range(callee.params))
+            return f"{callee.name}({args})"
+        return self.int_leaf_simple(ctx)
+
+    def int_leaf_simple(self, ctx: Context) -> str:
+        choices: list[str] = [str(self.rng.randint(0, 100)), "-" + str(self.rng.randint(1, 9))]
+        if ctx.ints:
+            choices.append(self.rng.choice(ctx.ints))
+        if ctx.arrays:
+            index = self.rng.randrange(self.shape.array_length)
+            choices.append(f"{self.rng.choice(ctx.arrays)}[{index}]")
+        return self.rng.choice(choices)
+
+    def bool_expr(self, ctx: Context) -> str:
+        op = self.rng.choice(["<", "<=", ">", ">=", "==", "!="])
+        depth = max(0, self.shape.expr_depth - 1)
+        test = f"{self.int_expr(ctx, depth)} {op} {self.int_expr(ctx, depth)}"
+        match self.rng.randrange(4):
+            case 0:
+                return f"not ({test})"
+            case 1:
+                return f"({test}) and {self.rng.choice(['true', 'false'])}"
+            case 2:
+                return f"({test}) or false"
+            case _:
+                return test
+
+    def lhs(self, ctx: Context) -> str:
+        if ctx.arrays and self.rng.random() < 0.3:
+            index = self.rng.randrange(self.shape.array_length)
+            return f"{self.rng.choice(ctx.arrays)}[{index}]"
+        return self.rng.choice([v for v in ctx.ints if not v.startswith("p")])
+
+    def block(
+        self, ctx: Context, nesting: int, indent: int, tail: list[str]
+    ) -> list[str]:
+        decls, stmts = self.compound(ctx, nesting, indent, tail)
+        return decls + stmts
+
+    def compound(
+        self, ctx: Context, nesting: int, indent: int, tail: list[str]
+    ) -> tuple[list[str], list[str]]:
+        # (declarations, statements); `tail` statements close the block
+        # (loop increments, returns).
+        pad = "    " * indent
+        decls: list[str] = []
+        stmts: list[str] = []
+        local = ctx.name("v")
+        decls.append(f"{pad}var {local} : int")
+        # Not readable until assigned, so not in its own initializer.
+        stmts.append(f"{pad}{local} = {self.int_expr(ctx, self.shape.expr_depth)}")
+        ctx.ints.append(local)
+        for _ in range(self.shape.statements):
+            kind = self.rng.randrange(4) if nesting > 0 else self.rng.randrange(2)
+            match kind:
+                case 0:
+                    stmts.append(
+                        f"{pad}{self.lhs(ctx)} = {self.int_expr(ctx, self.shape.expr_depth)}"
+                    )
+                case 1:
+                    stmts.append(f"{pad}print {self.int_expr(ctx, self.shape.expr_depth)}")
+                case 2:
+                    stmts.append(f"{pad}if {self.bool_expr(ctx)} {{")
+                    stmts.extend(self.block(ctx.nested(), nesting - 1, indent + 1, []))
+                    if self.rng.random() < 0.5:
+                        stmts.append(f"{pad}}} else {{")
+                        stmts.extend(
+                            self.block(ctx.nested(), nesting - 1, indent + 1, [])
+                        )
+                    stmts.append(f"{pad}}}")
+                case _:
+                    counter = ctx.name("w")
+                    decls.append(f"{pad}var {counter} : int")
+                    stmts.append(f"{pad}{counter} = 0")
+                    stmts.append(f"{pad}while {counter} < {self.shape.loop_count} {{")
+                    inner = ctx.nested()
+                    step = f"{pad}    {counter} = {counter} + 1"
+                    stmts.extend(self.block(inner, nesting - 1, indent + 1, [step]))
+                    stmts.append(f"{pad}}}")
+        return decls, stmts + tail
+
+    def function(self, fn: Function, callees: list[Function]) -> str:
+        params = [f"p{i}" for i in range(fn.params)]
+        ctx = Context(list(params), [], callees)
+        decls: list[str] = []
+        inits: list[str] = []
+        for _ in range(self.shape.arrays):
+            arr = ctx.name("a")
+            decls.append(f"    var {arr} : [{self.shape.array_length}] int")
+            inits.extend(
+                f"    {arr}[{i}] = {self.rng.randint(0, 50)}"
+                for i in range(self.shape.array_length)
+            )
+            ctx.arrays.append(arr)
+        ret = f"    return {self.int_expr(ctx, self.shape.expr_depth)}"
+        # the body's own declarations go above the array initialisers
+        body_decls, body_stmts = self.compound(ctx, self.shape.nesting, 1, [ret])
+        signature = ", ".join(f"{p} : int" for p in params)
+        lines = [f"func {fn.name}({signature}) : int {{"]
+        lines += decls + body_decls + inits + body_stmts
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def main(self, functions: list[Function]) -> str:
+        lines = ["func main() : void {"]
+        for fn in functions[-min(len(functions), 8) :]:
+            args = ", ".join(str(self.rng.randint(0, 9)) for _ in range(fn.params))
+            lines.append(f"    print {fn.name}({args})")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, out: TextIO) -> int:
+        written: int = 0
+        functions: list[Function] = []
+        i: int = 0
+        while (
+            written < self.shape.size if self.shape.size else i < self.shape.functions
+        ):
+            fn = Function(f"f{i}", self.rng.randint(0, self.shape.params))
+            text = self.function(fn, functions)
+            out.write(text)
+            written += len(text)
+            functions.append(fn)
+            i += 1
+        text = self.main(functions)
+        out.write(text)
+        return written + len(text)
+
+
+def main() -> None:
+    args: argparse.Namespace = parse_args()
+    shape = Shape(
+        functions=args.functions,
+        params=args.params,
+        statements=args.statements,
+        nesting=args.nesting,
+        expr_depth=args.expr_depth,
+        arrays=args.arrays,
+        array_length=args.array_length,
+        call_density=args.call_density,
+        loop_count=args.loop_count,
+        size=args.size,
+    )
+    generator = Generator(shape, args.seed)
+    if args.output == "-":
+        generator.write(sys.stdout)
+        return
+    with open(args.output, "w") as f:
+        generator.write(f)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Tau program")
+    parser.add_argument("--output", type=str, required=True, help="output file, or -")
+    parser.add_argument("--force", action="store_true", help="force overwrite")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--functions", type=int, default=10, help="number of functions")
+    parser.add_argument("--params", type=int, default=2, help="max parameters per function")
+    parser.add_argument(
+        "--statements", type=int, default=4, help="statements per compound statement"
+    )
+    parser.add_argument("--nesting", type=int, default=2, help="if/while nesting depth")
+    parser.add_argument(
+        "--expr-depth", type=int, default=3, help="depth of binary operator chains"
+    )
+    parser.add_argument("--arrays", type=int, default=1, help="local arrays per function")
+    parser.add_argument("--array-length", type=int, default=8, help="length of each array")
+    parser.add_argument(
+        "--call-density",
+        type=float,
+        default=0.2,
+        help="probability that an expression leaf is a call",
+    )
+    parser.add_argument(
+        "--loop-count", type=int, default=2, help="iterations of each while loop"
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=0,
+        help="approximate output size in bytes (overrides --functions)",
+    )
+    args = parser.parse_args()
+    if args.output != "-" and os.path.exists(args.output) and not args.force:
+        parser.error(f"{args.output} already exists (use --force to overwrite)")
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from typing import Any, Callable, Optional, Sequence
+from dataclasses import dataclass, field
+from operator import attrgetter
+import functools
+import os
+import tomllib
+import typing
+
+from tau import asts
+from tau.utilities import mktemplate
+
+
+def load_children(spec: str) -> dict[type, tuple[str, ...]]:
+    # Child fields of every node class, in the order visitor.Visitor visits
+    # them: the AST-valued fields that the spec (visitor.toml) does not
+    # exclude, in declaration order.  "name[]" fields hold lists and are
+    # visited element by element; "name?" fields are Optional and skipped
+    # when None.
+    with open(spec, "rb") as f:
+        params = mktemplate.Params(tomllib.load(f))
+    table: dict[type, tuple[str, ...]] = {}
+    for cls in vars(asts).values():
+        if not (isinstance(cls, type) and issubclass(cls, asts.AST)):
+            continue
+        if cls.__subclasses__():
+            continue  # abstract bases such as asts.Expr are never visited
+        fields: list[str] = []
+        for name, hint in typing.get_type_hints(cls).items():
+            if name.startswith("__") or params.is_field_excluded(name):
+                continue
+            if params.is_field_opaque(name) or params.is_type_opaque(hint):
+                continue
+            ty, kind = mktemplate.basic_type(hint)
+            if not issubclass(ty, asts.AST) or params.is_type_excluded(hint):
+                continue
+            fields.append(name + {"list": "[]", "optional": "?"}.get(kind, ""))
+        table[cls] = tuple(fields)
+    return table
+
+
+children: dict[type, tuple[str, ...]] = load_children(
+    os.path.join(os.path.dirname(__file__), "visitor.toml")
+)
+
+Handler = Callable[[asts.AST], None]
+Pusher = Callable[[asts.AST, Callable[[Any], None], Callable[[Any], None]], None]
+
+
+@functools.cache
+def child_fields(cls: type) -> tuple[str, ...]:
+    # Subclasses of a known node class inherit its child fields.
+    for base in cls.__mro__:
+        if base in children:
+            return children[base]
+    raise NotImplementedError(f"Unknown type {cls}")
+
+
+def field_names(cls: type) -> list[str]:
+    return [f.rstrip("[]?") for f in child_fields(cls)]
+
+
+@functools.cache
+def _children(fields: tuple[str, ...]) -> Callable[[Any], Sequence[asts.AST]]:
+    # Children of a node in visiting order.  attrgetter does the common
+    # shapes in one call: several plain fields come back as a tuple, and a
+    # lone list field is its own sequence.
+    names = [f.rstrip("[]?") for f in fields]
+    if all(f == name for f, name in zip(fields, names)):
+        if len(names) == 1:
+            get = attrgetter(names[0])
+            return lambda node: (get(node),)
+        return attrgetter(*names)
+    if len(fields) == 1 and fields[0].endswith("[]"):
+        return attrgetter(names[0])
+    getters = [(attrgetter(name), f[-1]) for f, name in zip(fields, names)]
+
+    def get_children(node: Any) -> Sequence[asts.AST]:
+        found: list[asts.AST] = []
+        for get, kind in getters:
+            value = get(node)
+            if kind == "]":
+                found.extend(value)
+            elif value is not None:
+                found.append(value)
+        return found
+
+    return get_children
+
+
+@functools.cache
+def _visit(fields: tuple[str, ...]) -> Callable[[asts.AST, Handler], None]:
+    if not fields:
+        return lambda node, fn: fn(node)
+    get_children = _children(fields)
+
+    def visit(node: asts.AST, fn: Handler) -> None:
+        fn(node)
+        for child in get_children(node):
+            _visits[type(child)](child, fn)
+
+    return visit
+
+
+@functools.cache
+def _pusher(fields: tuple[str, ...]) -> Optional[Pusher]:
+    # Pushes children in reverse so they are popped in visiting order.
+    if not fields:
+        return None
+    if len(fields) == 1 and not fields[0].endswith(("[]", "?")):
+        get = attrgetter(fields[0])
+        return lambda node, append, extend: append(get(node))
+    get_children = _children(fields)
+    return lambda node, append, extend: extend(get_children(node)[::-1])
+
+
+class _Pushers(dict[type, Optional[Pusher]]):
+    def __missing__(self, cls: type) -> Optional[Pusher]:
+        self[cls] = _pusher(child_fields(cls))
+        return self[cls]
+
+
+class _Visits(dict[type, Callable[[asts.AST, Handler], None]]):
+    def __missing__(self, cls: type) -> Callable[[asts.AST, Handler], None]:
+        self[cls] = _visit(child_fields(cls))
+        return self[cls]
+
+
+_pushers = _Pushers()
+_visits = _Visits()
+
+
+def _ignore(ast: asts.AST) -> None:
+    pass
+
+
+@dataclass
+class TableVisitor:
+    # Pre-order visitor driven by per-class dispatch tables instead of the
+    # match chains in visitor.Visitor.  `fn` sees every node; `handlers` maps
+    # node classes (or their bases, e.g. asts.Expr) to more specific
+    # callbacks, which take precedence over `fn`.  The tables are shared by
+    # all visitors and fill in lazily, so subclasses of node classes resolve
+    # through their MRO on first sight.
+    fn: Optional[Handler] = None
+    handlers: dict[type, Handler] = field(default_factory=dict)
+    resolved: dict[type, Handler] = field(init=False, default_factory=dict)
+    dispatch: Handler = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.handlers:
+            self.dispatch = self.by_type
+        else:
+            self.dispatch = self.fn if self.fn is not None else _ignore
+
+    def by_type(self, ast: asts.AST) -> None:
+        cls = type(ast)
+        if cls not in self.resolved:
+            self.resolved[cls] = self.handler(cls)
+        self.resolved[cls](ast)
+
+    def handler(self, cls: type) -> Handler:
+        for base in cls.__mro__:
+            if base in self.handlers:
+                return self.handlers[base]
+        return self.fn if self.fn is not None else _ignore
+
+    def AST(self, ast: asts.AST) -> None:
+        _visits[type(ast)](ast, self.dispatch)
+
+    def walk(self, ast: asts.AST) -> None:
+        # Same visiting order as AST(), but with an explicit stack, so tree
+        # depth is not limited by the recursion limit.
+        fn = self.dispatch
+        pushers = _pushers
+        stack: list[asts.AST] = [ast]
+        pop, append, extend = stack.pop, stack.append, stack.extend
+        while stack:
+            node = pop()
+            push = pushers[type(node)]
+            fn(node)
+            if push is not None:
+                push(node, append, extend)
@@ -0,0 +1,52 @@
+from typing import Iterator, NamedTuple, Optional
+
+from tau import asts
+from tau.utilities.table_visitor import field_names
+
+ENTER: str = "enter"
+EXIT: str = "exit"
+
+
+class Event(NamedTuple):
+    event: str  # ENTER or EXIT
+    node: asts.AST
+    parent: Optional[asts.AST]
+    field: str  # parent's field holding node ("" for the root)
+
+
+def events(
+    root: asts.AST,
+    types: Optional[tuple[type, ...]] = None,
+    exits: bool = True,
+) -> Iterator[Event]:
+    # Lazily yields ENTER/EXIT events in the same pre-order as
+    # visitor.Visitor, without recursion.  Only nodes that are instances of
+    # `types` (if given) produce events, but the whole tree is traversed.
+    # Memory is bounded by the tree's depth times its fan-out, and a
+    # consumer can stop at any point simply by not asking for more.
+    stack: list[tuple[asts.AST, Optional[asts.AST], str, bool]] = [
+        (root, None, "", False)
+    ]
+    while stack:
+        node, parent, field, done = stack.pop()
+        if done:
+            yield Event(EXIT, node, parent, field)
+            continue
+        if types is None or isinstance(node, types):
+            yield Event(ENTER, node, parent, field)
+            if exits:
+                stack.append((node, parent, field, True))
+        for name in reversed(field_names(type(node))):
+            child = getattr(node, name)
+            if child is None:
+                continue
+            if type(child) is list:
+                for c in reversed(child):
+                    stack.append((c, node, name, False))
+            else:
+                stack.append((child, node, name, False))
+
+
+def nodes(root: asts.AST, types: Optional[tuple[type, ...]] = None) -> Iterator[asts.AST]:
+    for event in events(root, types, exits=False):
+        yield event.node
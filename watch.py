@@ -0,0 +1,32 @@
+import os
+import time
+from typing import Callable
+
+from .compile import expand_paths
+
+
+def snapshot(patterns: list[str]) -> dict[str, int]:
+    stamps: dict[str, int] = {}
+    for fname in expand_paths(patterns):
+        try:
+            stamps[fname] = os.stat(fname).st_mtime_ns
+        except OSError:
+            pass
+    return stamps
+
+
+def watch(
+    patterns: list[str],
+    on_change: Callable[[list[str]], None],
+    interval: float = 0.25,
+) -> None:
+    # Polls modification times; patterns are re-expanded every round so new
+    # files dropped into a watched directory are picked up.
+    stamps: dict[str, int] = {}
+    while True:
+        current = snapshot(patterns)
+        changed = [fname for fname, stamp in current.items() if stamps.get(fname) != stamp]
+        stamps = current
+        if changed:
+            on_change(changed)
+        time.sleep(interval)